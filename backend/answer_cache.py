@@ -0,0 +1,230 @@
+"""
+面试问题回答缓存
+按归一化后的问题文本精确匹配；配置了本地向量模型时，再按语义相似度匹配换了说法的问题。
+支持 TTL 过期和 LRU 淘汰
+"""
+
+import time
+import threading
+import logging
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """归一化问题文本：全角转半角、小写、去掉标点、符号和空白"""
+    text = unicodedata.normalize('NFKC', question).lower()
+    return ''.join(ch for ch in text if unicodedata.category(ch)[0] not in ('P', 'S', 'Z', 'C'))
+
+
+class _NumpyIndex:
+    """暴力搜索的向量索引（精确，适合几百到几千条）"""
+
+    def __init__(self):
+        import numpy as np
+        self.np = np
+        self._labels: List[str] = []
+        self._vectors = None
+
+    def add(self, label: str, vector):
+        vector = vector.reshape(1, -1)
+        self._vectors = vector if self._vectors is None else self.np.vstack((self._vectors, vector))
+        self._labels.append(label)
+
+    def remove(self, label: str):
+        if label not in self._labels:
+            return
+        index = self._labels.index(label)
+        self._labels.pop(index)
+        self._vectors = self.np.delete(self._vectors, index, axis=0)
+        if not self._labels:
+            self._vectors = None
+
+    def search(self, vector) -> Optional[Tuple[str, float]]:
+        if self._vectors is None:
+            return None
+        scores = self._vectors @ vector
+        best = int(self.np.argmax(scores))
+        return self._labels[best], float(scores[best])
+
+
+class _HNSWIndex:
+    """基于 hnswlib 的近似最近邻索引"""
+
+    def __init__(self, dim: int, max_elements: int):
+        import hnswlib
+        self.index = hnswlib.Index(space='cosine', dim=dim)
+        self.index.init_index(max_elements=max_elements, ef_construction=100, M=16, allow_replace_deleted=True)
+        self.index.set_ef(50)
+        self._ids = {}
+        self._labels = {}
+        self._next_id = 0
+        self._deleted = 0  # 已标记删除、可被复用的位置数
+
+    def add(self, label: str, vector):
+        if self._deleted:
+            self._deleted -= 1
+        elif self.index.get_current_count() >= self.index.get_max_elements():
+            # 正常情况下调用方先淘汰再写入，不会走到这里；保险起见扩容，避免写入报错
+            self.index.resize_index(max(16, self.index.get_max_elements() * 2))
+        item_id = self._next_id
+        self._next_id += 1
+        self.index.add_items(vector.reshape(1, -1), [item_id], replace_deleted=True)
+        self._ids[label] = item_id
+        self._labels[item_id] = label
+
+    def remove(self, label: str):
+        item_id = self._ids.pop(label, None)
+        if item_id is not None:
+            self.index.mark_deleted(item_id)
+            del self._labels[item_id]
+            self._deleted += 1
+
+    def search(self, vector) -> Optional[Tuple[str, float]]:
+        if not self._ids:
+            return None
+        ids, distances = self.index.knn_query(vector.reshape(1, -1), k=1)
+        label = self._labels.get(int(ids[0][0]))
+        if label is None:
+            return None
+        return label, 1.0 - float(distances[0][0])
+
+
+class SentenceEmbedder:
+    """本地 CPU 句向量模型（sentence-transformers），输出单位向量"""
+
+    def __init__(self, model_name: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            logger.error("未安装 sentence-transformers，请运行: pip install sentence-transformers")
+            raise
+
+        self.model = SentenceTransformer(model_name, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, text: str):
+        return self.model.encode(text, normalize_embeddings=True)
+
+
+class AnswerCache:
+    """回答缓存"""
+
+    def __init__(self, max_entries: int = 500, ttl: float = 86400, similarity_threshold: float = 0.9,
+                 embedder: Optional[SentenceEmbedder] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embedder = embedder
+
+        self._entries: 'OrderedDict[str, dict]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._index = None
+        if embedder:
+            try:
+                self._index = _HNSWIndex(embedder.dim, max_entries)
+            except ImportError:
+                self._index = _NumpyIndex()
+
+        self._hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, question: str) -> Optional[dict]:
+        """
+        查询缓存
+
+        Returns:
+            dict: {'answer', 'question', 'similarity'}，未命中返回 None
+        """
+        key = normalize_question(question)
+
+        with self._lock:
+            entry = self._lookup(key)
+            if entry:
+                self._hits += 1
+                return {'answer': entry['answer'], 'question': entry['question'], 'similarity': 1.0}
+            if not self._index:
+                self._misses += 1
+                return None
+
+        # 向量计算较慢，不在锁内进行
+        vector = self.embedder.encode(question)
+
+        with self._lock:
+            match = self._index.search(vector)
+            if match and match[1] >= self.similarity_threshold:
+                entry = self._lookup(match[0])
+                if entry:
+                    self._hits += 1
+                    self._semantic_hits += 1
+                    return {'answer': entry['answer'], 'question': entry['question'], 'similarity': match[1]}
+            self._misses += 1
+            return None
+
+    def put(self, question: str, answer: str):
+        """写入缓存"""
+        key = normalize_question(question)
+        if not key or not answer:
+            return
+
+        vector = self.embedder.encode(question) if self._index else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            # 先淘汰再写入，向量索引的容量只有 max_entries
+            while self._entries and len(self._entries) >= self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._evictions += 1
+
+            self._entries[key] = {
+                'question': question,
+                'answer': answer,
+                'created_at': time.time()
+            }
+            if vector is not None:
+                self._index.add(key, vector)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def get_stats(self) -> dict:
+        """命中率等统计信息"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'semantic_hits': self._semantic_hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'semantic': self._index is not None
+            }
+
+    def _lookup(self, key: str) -> Optional[dict]:
+        """按 key 取条目，顺带处理过期和 LRU 顺序（调用方持有锁）"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl and time.time() - entry['created_at'] > self.ttl:
+            self._remove(key)
+            self._expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: str):
+        self._entries.pop(key, None)
+        if self._index:
+            self._index.remove(key)
@@ -0,0 +1,140 @@
+"""
+异步回答生成
+接口收到问题后立即返回，Gemini 调用在工作线程池中进行，完成后通过回调推送结果
+"""
+
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterator, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# 回答状态
+STATUS_SKIPPED = 'skipped'      # 未请求生成回答
+STATUS_PENDING = 'pending'      # 已排队
+STATUS_RUNNING = 'running'      # 生成中
+STATUS_DONE = 'done'            # 已完成
+STATUS_FAILED = 'failed'        # 生成失败
+
+
+class AnswerJobManager:
+    """回答生成任务管理器"""
+
+    def __init__(self, max_workers: int = 4, max_jobs: int = 1000):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='answer')
+        self.max_jobs = max_jobs
+        self._jobs: Dict[int, dict] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, conversation: dict, generate: Callable[[str], Union[str, Iterator[str]]],
+               on_complete: Callable[[dict], None],
+               on_delta: Optional[Callable[[dict, str, int], None]] = None) -> bool:
+        """
+        提交回答生成任务
+
+        Args:
+            conversation: 对话记录，任务完成后原地更新 answer / has_answer / answer_status
+            generate: 生成函数，参数为问题，返回完整回答；设置 on_delta 时返回增量文本的迭代器
+            on_complete: 任务结束（成功或失败）后的回调，参数为更新后的对话记录
+            on_delta: 流式生成时每收到一块文本的回调，参数为 (对话记录, 增量文本, 块序号)
+
+        Returns:
+            bool: 是否提交成功；同一对话已有进行中的任务时返回 False
+        """
+        conversation_id = conversation['id']
+        with self._lock:
+            job = self._jobs.get(conversation_id)
+            if job and job['status'] in (STATUS_PENDING, STATUS_RUNNING):
+                return False
+
+            self._jobs[conversation_id] = {
+                'conversation_id': conversation_id,
+                'status': STATUS_PENDING,
+                'submitted_at': datetime.now().isoformat(),
+                'started_at': None,
+                'first_token_at': None,
+                'finished_at': None,
+                'error': None
+            }
+            self._prune()
+
+        conversation['answer_status'] = STATUS_PENDING
+        self.executor.submit(self._run, conversation, generate, on_complete, on_delta)
+        return True
+
+    def get_job(self, conversation_id: int) -> Optional[dict]:
+        """查询任务状态"""
+        with self._lock:
+            job = self._jobs.get(conversation_id)
+            return dict(job) if job else None
+
+    def get_stats(self) -> dict:
+        """各状态的任务数量"""
+        with self._lock:
+            stats = {STATUS_PENDING: 0, STATUS_RUNNING: 0, STATUS_DONE: 0, STATUS_FAILED: 0}
+            for job in self._jobs.values():
+                stats[job['status']] += 1
+            return stats
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+
+    def _prune(self):
+        """任务记录超过上限时，按提交顺序清理已结束的任务"""
+        overflow = len(self._jobs) - self.max_jobs
+        if overflow <= 0:
+            return
+        finished = [cid for cid, job in self._jobs.items() if job['status'] in (STATUS_DONE, STATUS_FAILED)]
+        for cid in finished[:overflow]:
+            del self._jobs[cid]
+
+    def _update_job(self, conversation_id: int, **fields):
+        with self._lock:
+            self._jobs[conversation_id].update(fields)
+
+    def _run(self, conversation: dict, generate: Callable, on_complete: Callable[[dict], None],
+             on_delta: Optional[Callable[[dict, str, int], None]]):
+        conversation_id = conversation['id']
+        self._update_job(conversation_id, status=STATUS_RUNNING, started_at=datetime.now().isoformat())
+        conversation['answer_status'] = STATUS_RUNNING
+
+        try:
+            if on_delta:
+                answer = self._consume_stream(conversation, generate(conversation['question']), on_delta)
+            else:
+                answer = generate(conversation['question'])
+            conversation['answer'] = answer
+            conversation['has_answer'] = True
+            conversation['answer_status'] = STATUS_DONE
+            self._update_job(conversation_id, status=STATUS_DONE, finished_at=datetime.now().isoformat())
+            logger.info(f"对话 {conversation_id} 回答生成完成")
+        except Exception as e:
+            conversation['answer_status'] = STATUS_FAILED
+            self._update_job(
+                conversation_id,
+                status=STATUS_FAILED,
+                finished_at=datetime.now().isoformat(),
+                error=str(e)
+            )
+            logger.error(f"对话 {conversation_id} 回答生成失败：{str(e)}")
+
+        try:
+            on_complete(conversation)
+        except Exception as e:
+            logger.error(f"推送对话 {conversation_id} 更新失败：{str(e)}")
+
+    def _consume_stream(self, conversation: dict, chunks: Iterator[str],
+                        on_delta: Callable[[dict, str, int], None]) -> str:
+        """逐块读取流式回答并回调，返回拼接后的完整回答"""
+        parts = []
+        for index, delta in enumerate(chunks):
+            parts.append(delta)
+            if index == 0:
+                self._update_job(conversation['id'], first_token_at=datetime.now().isoformat())
+            try:
+                on_delta(conversation, delta, index)
+            except Exception as e:
+                logger.error(f"推送对话 {conversation['id']} 增量回答失败：{str(e)}")
+        return ''.join(parts).strip()
@@ -1,12 +1,28 @@
+from config import Config
+
+# eventlet 模式需要在导入其他模块之前打补丁
+if Config.SOCKETIO_ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+
 from flask import Flask, request, jsonify
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_cors import CORS
+import atexit
 import logging
 from datetime import datetime
 import json
+from typing import Optional, Tuple
 
-from config import Config
-from gemini_client import GeminiClient
+from async_runtime import run_blocking
+from llm_provider import EMPTY_ANSWER, create_llm_provider
+from answer_jobs import AnswerJobManager, STATUS_SKIPPED
+from answer_cache import AnswerCache, SentenceEmbedder
+from conversation_store import DEFAULT_PAGE_SIZE, DEFAULT_SESSION_ID, MAX_PAGE_SIZE, create_conversation_store
+from history_sync import build_history_page, compress_socket_payload, json_response
+from idempotency import IdempotencyIndex
+from context_builder import ContextBuilder, is_follow_up
+from rate_limiter import AnswerAdmission, RateLimiter
 
 # 配置日志
 logging.basicConfig(
@@ -22,23 +38,236 @@ app.config.from_object(Config)
 # 配置 CORS
 CORS(app, origins=Config.CORS_ORIGINS)
 
-# 配置 SocketIO
+# 配置 SocketIO；配置了消息队列时，多个工作进程通过消息队列转发事件
 socketio = SocketIO(
     app, 
     cors_allowed_origins=Config.CORS_ORIGINS,
-    async_mode='eventlet'
+    async_mode=Config.SOCKETIO_ASYNC_MODE,
+    message_queue=Config.SOCKETIO_MESSAGE_QUEUE or None
 )
 
-# 初始化 Gemini 客户端
+# 初始化大模型提供商（LLM_PROVIDER：gemini / mock）
 try:
-    gemini_client = GeminiClient()
-    logger.info("Gemini 客户端初始化成功")
+    llm_client = create_llm_provider()
+    logger.info(f"大模型提供商 {llm_client.name} 初始化成功")
 except Exception as e:
-    logger.error(f"Gemini 客户端初始化失败：{str(e)}")
-    gemini_client = None
+    logger.error(f"大模型提供商初始化失败：{str(e)}")
+    llm_client = None
 
 # 存储对话历史
-conversation_history = []
+conversation_store = create_conversation_store()
+atexit.register(conversation_store.close)  # 退出前提交尚未落盘的写入
+
+# 回答缓存（可选语义匹配）
+answer_cache = None
+if Config.ANSWER_CACHE_ENABLED:
+    embedder = None
+    if Config.ANSWER_CACHE_EMBEDDING_MODEL:
+        try:
+            embedder = SentenceEmbedder(Config.ANSWER_CACHE_EMBEDDING_MODEL)
+            logger.info(f"回答缓存语义匹配已启用：{Config.ANSWER_CACHE_EMBEDDING_MODEL}")
+        except Exception as e:
+            logger.error(f"加载句向量模型失败，仅使用精确匹配：{str(e)}")
+    answer_cache = AnswerCache(
+        max_entries=Config.ANSWER_CACHE_MAX_ENTRIES,
+        ttl=Config.ANSWER_CACHE_TTL,
+        similarity_threshold=Config.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        embedder=embedder
+    )
+
+# 对话上下文：生成回答时带上同一会话之前的问答（CONTEXT_MAX_TOKENS=0 时关闭）
+context_builder = None
+if Config.CONTEXT_MAX_TOKENS > 0:
+    context_builder = ContextBuilder(
+        conversation_store,
+        max_tokens=Config.CONTEXT_MAX_TOKENS,
+        recent_turns=Config.CONTEXT_RECENT_TURNS,
+        relevant_turns=Config.CONTEXT_RELEVANT_TURNS,
+        scan_turns=Config.CONTEXT_SCAN_TURNS,
+        turn_max_tokens=Config.CONTEXT_TURN_MAX_TOKENS,
+        summary_max_tokens=Config.CONTEXT_SUMMARY_MAX_TOKENS
+    )
+
+# 回答生成任务（工作线程池）
+answer_jobs = AnswerJobManager(max_workers=Config.ANSWER_WORKERS)
+
+# 限流：按会话（没有会话时按客户端地址）限制每分钟提问次数
+rate_limiter = RateLimiter(Config.MAX_REQUESTS_PER_MINUTE) if Config.RATE_LIMIT_ENABLED else None
+
+# 准入控制：同时进行的 Gemini 调用数和排队数上限
+answer_admission = AnswerAdmission(Config.MAX_CONCURRENT_ANSWERS, Config.ANSWER_QUEUE_SIZE)
+
+# 幂等键索引：客户端重试同一个问题时返回第一次的结果，并发的重复请求共享一次处理
+idempotency_index = IdempotencyIndex(
+    ttl=Config.IDEMPOTENCY_TTL,
+    max_entries=Config.IDEMPOTENCY_MAX_KEYS,
+    wait_timeout=Config.IDEMPOTENCY_WAIT_TIMEOUT
+)
+
+# 每个 Socket.IO 连接当前所在的会话（sid -> session_id）
+client_sessions = {}
+
+def session_room(session_id: str) -> str:
+    """会话对应的 Socket.IO 房间名，事件只推送给同一会话的客户端"""
+    return f"session:{session_id or DEFAULT_SESSION_ID}"
+
+def _read_session_id(*sources) -> str:
+    """依次从请求体 / auth / 查询参数中读取会话 ID，都没有时使用默认会话"""
+    for source in sources:
+        session_id = (source or {}).get('session_id')
+        if session_id:
+            return str(session_id)
+    return DEFAULT_SESSION_ID
+
+def _too_many_requests(message: str, retry_after: int) -> Tuple[dict, int]:
+    """429 结果，HTTP 接口据此设置 Retry-After 头"""
+    return {'error': message, 'retry_after': retry_after}, 429
+
+def check_rate_limit(session_id: str):
+    """
+    检查限流（按会话；默认会话的客户端共用一个会话 ID，改为按客户端地址）
+    
+    Returns:
+        被限流时返回 (提示信息, Retry-After 秒数)，否则返回 None
+    """
+    if not rate_limiter:
+        return None
+    key = session_id if session_id != DEFAULT_SESSION_ID else request.remote_addr
+    allowed, retry_after = rate_limiter.check(key)
+    if allowed:
+        return None
+    logger.warning(f"请求过于频繁，已限流：{key}")
+    return '请求过于频繁，请稍后重试', retry_after
+
+def schedule_answer(conversation: dict) -> bool:
+    """
+    提交回答生成任务，流式模式下逐块推送 answer_delta，完成后推送 answer_done 和 conversation_updated
+    
+    调用前需先通过 answer_admission.try_admit() 占用名额，任务结束后归还
+    """
+    if Config.GEMINI_STREAMING:
+        submitted = answer_jobs.submit(
+            conversation,
+            lambda question: generate_answer_stream(conversation, question),
+            on_answer_complete,
+            on_delta=on_answer_delta
+        )
+    else:
+        submitted = answer_jobs.submit(
+            conversation,
+            lambda question: generate_answer(conversation, question),
+            on_answer_complete
+        )
+    
+    if not submitted:
+        answer_admission.release()
+        return False
+    
+    # 落盘 pending 状态，避免历史查询和上下文构建读到创建时的 skipped 快照
+    conversation_store.update(conversation['id'], answer_status=conversation['answer_status'])
+    return True
+
+def _lookup_cached_answer(conversation: dict, question: str):
+    """查询回答缓存，命中时在对话记录上标注来源"""
+    if not answer_cache:
+        return None
+    
+    try:
+        cached = run_blocking(answer_cache.get, question)
+    except Exception as e:
+        logger.error(f"查询回答缓存失败：{str(e)}")
+        return None
+    if cached:
+        conversation['cached'] = True
+        conversation['cache_similarity'] = round(cached['similarity'], 4)
+        logger.info(f"回答缓存命中（相似度 {cached['similarity']:.3f}）：{cached['question'][:50]}")
+        return cached['answer']
+    return None
+
+def _store_cached_answer(question: str, answer: str):
+    """写入回答缓存；回答已经生成，缓存出错只记录日志，不影响本次回答"""
+    if not answer_cache or answer == EMPTY_ANSWER:
+        return
+    try:
+        run_blocking(answer_cache.put, question, answer)
+    except Exception as e:
+        logger.error(f"写入回答缓存失败：{str(e)}")
+
+def _build_context(conversation: dict) -> str:
+    """构建同一会话之前的问答上下文，失败时不带上下文继续生成"""
+    if not context_builder:
+        return ''
+    try:
+        return run_blocking(context_builder.build, conversation)
+    except Exception as e:
+        logger.error(f"构建对话上下文失败：{str(e)}")
+        return ''
+
+def generate_answer(conversation: dict, question: str) -> str:
+    """
+    生成回答，优先使用缓存
+    
+    回答缓存只按问题文本匹配：带上下文的追问的回答依赖本会话之前的问答，不读也不写缓存；
+    本身完整的问题（如“介绍一下你做过的项目”）即使带上下文也读写缓存
+    """
+    context = _build_context(conversation)
+    use_cache = not context or not is_follow_up(question)
+    if use_cache:
+        cached_answer = _lookup_cached_answer(conversation, question)
+        if cached_answer:
+            return cached_answer
+    
+    with answer_admission.slot():
+        answer = llm_client.generate_answer(question, raise_errors=True, context=context)
+    if use_cache:
+        _store_cached_answer(question, answer)
+    return answer
+
+def generate_answer_stream(conversation: dict, question: str):
+    """流式生成回答，缓存命中时一次性返回整段回答；带上下文的追问不使用缓存（同 generate_answer）"""
+    context = _build_context(conversation)
+    use_cache = not context or not is_follow_up(question)
+    if use_cache:
+        cached_answer = _lookup_cached_answer(conversation, question)
+        if cached_answer:
+            yield cached_answer
+            return
+    
+    parts = []
+    with answer_admission.slot():
+        for delta in llm_client.generate_answer_stream(question, context=context):
+            parts.append(delta)
+            yield delta
+    
+    answer = ''.join(parts).strip()
+    if use_cache:
+        _store_cached_answer(question, answer)
+
+def on_answer_delta(conversation: dict, delta: str, index: int):
+    """推送增量回答"""
+    socketio.emit('answer_delta', {
+        'conversation_id': conversation['id'],
+        'delta': delta,
+        'index': index
+    }, to=session_room(conversation['session_id']))
+
+def on_answer_complete(conversation: dict):
+    """回答生成结束后归还准入名额，保存并推送最终结果"""
+    answer_admission.release()
+    conversation_store.update(
+        conversation['id'],
+        answer=conversation['answer'],
+        has_answer=conversation['has_answer'],
+        answer_status=conversation['answer_status']
+    )
+    room = session_room(conversation['session_id'])
+    if Config.GEMINI_STREAMING:
+        socketio.emit('answer_done', {
+            'conversation_id': conversation['id'],
+            'answer': conversation['answer'],
+            'answer_status': conversation['answer_status']
+        }, to=room)
+    socketio.emit('conversation_updated', conversation, to=room)
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -46,84 +275,391 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'gemini_available': gemini_client is not None
+        'llm_available': llm_client is not None,
+        'llm_provider': llm_client.name if llm_client else None,
+        'gemini_available': llm_client is not None,  # 兼容旧版客户端，新代码请读 llm_available
+        'llm': llm_client.get_stats() if llm_client else None,
+        'answer_jobs': answer_jobs.get_stats(),
+        'answer_cache': answer_cache.get_stats() if answer_cache else None,
+        'conversation_store': conversation_store.get_stats(),
+        'answer_admission': answer_admission.get_stats(),
+        'rate_limiter': rate_limiter.get_stats() if rate_limiter else None,
+        'idempotency': idempotency_index.get_stats(),
+        'context': context_builder.get_stats() if context_builder else None
     })
 
+def process_question(data: dict, idempotency_key: Optional[str] = None) -> Tuple[dict, int]:
+    """
+    处理一条问题（HTTP 接口和 Socket.IO submit_question 共用）
+    
+    Args:
+        idempotency_key: 幂等键（HTTP 请求头 Idempotency-Key），不传时使用请求体中的 client_id；
+            同一会话内重复的键返回第一次的结果（带 duplicate 标记），不会重复创建对话和生成回答
+    
+    Returns:
+        (响应内容, 状态码)：202 回答生成中，200 不生成回答或部分结果，400 参数错误，
+        409 相同的请求正在处理中，429 限流
+    """
+    if not data or 'question' not in data:
+        return {'error': '缺少问题内容'}, 400
+    
+    question = data['question'].strip()
+    
+    if not question:
+        return {'error': '问题内容不能为空'}, 400
+    
+    session_id = _read_session_id(data)
+    
+    # 流式转录的部分结果只做实时推送，不保存、不生成回答
+    if data.get('partial'):
+        socketio.emit('partial_transcript', {
+            'session_id': session_id,
+            'stream_id': data.get('stream_id'),
+            'committed': data.get('committed', ''),
+            'tentative': data.get('tentative', ''),
+            'text': question,
+            'timestamp': datetime.now().isoformat()
+        }, to=session_room(session_id))
+        return {'success': True, 'partial': True}, 200
+    
+    client_id = idempotency_key or data.get('client_id')
+    if not client_id:
+        return _accept_question(data, question, session_id, None)
+    
+    body, status_code = idempotency_index.run(
+        f"{session_id}:{client_id}",
+        lambda: _accept_question(data, question, session_id, client_id)
+    )
+    if body.get('duplicate'):
+        _refresh_replay(body)
+    return body, status_code
+
+def _refresh_replay(body: dict):
+    """幂等索引保存的是第一次响应时的快照，回答可能已经生成完成，重复请求返回存储中的最新对话记录"""
+    if not body.get('conversation_id'):
+        return
+    conversation = conversation_store.get(body['conversation_id'])
+    if conversation:
+        body['conversation'] = conversation
+
+def _accept_question(data: dict, question: str, session_id: str, client_id: Optional[str]) -> Tuple[dict, int]:
+    """限流和准入检查通过后创建对话，并按需提交回答生成"""
+    limited = check_rate_limit(session_id)
+    if limited:
+        return _too_many_requests(*limited)
+    
+    logger.info(f"收到问题：{question}")
+    
+    # 检查是否需要生成回答（根据 generate_answer 参数）
+    should_generate_answer = data.get('generate_answer', True) and llm_client is not None
+    
+    # 生成队列已满时直接拒绝，不创建对话记录
+    if should_generate_answer and not answer_admission.try_admit():
+        logger.warning("回答生成队列已满，拒绝请求")
+        return _too_many_requests('回答生成队列已满，请稍后重试', answer_admission.retry_after())
+    
+    # 创建对话记录（原子分配 ID），回答稍后异步生成
+    try:
+        conversation = conversation_store.create(
+            question,
+            answer_status=STATUS_SKIPPED,
+            stream_id=data.get('stream_id'),
+            client_id=client_id,
+            session_id=session_id
+        )
+    except Exception:
+        # 名额还没交给 schedule_answer，在这里归还
+        if should_generate_answer:
+            answer_admission.release()
+        raise
+    
+    if should_generate_answer:
+        schedule_answer(conversation)
+    else:
+        logger.info("跳过生成回答")
+    
+    # 通过 WebSocket 推送给同一会话的前端
+    socketio.emit('new_conversation', conversation, to=session_room(session_id))
+    
+    return {
+        'success': True,
+        'conversation_id': conversation['id'],
+        'conversation': conversation
+    }, 202 if should_generate_answer else 200
+
+def process_question_batch(data: dict) -> Tuple[dict, int]:
+    """
+    批量处理问题（HTTP 接口和 Socket.IO submit_questions 共用）
+    
+    请求体：{'session_id': ..., 'questions': [{'question', 'generate_answer', 'stream_id', 'client_id'}, ...]}
+    按顺序处理，所有对话在一次存储写入中创建，并向会话房间推送一条 new_conversations 事件；
+    整批只计一次限流
+    
+    Returns:
+        (响应内容, 状态码)：results 与 questions 一一对应，每项带 status_code（202/200/400/409/429）；
+        某个问题因生成队列已满被拒绝后，其后的问题也返回 429，客户端从该问题开始按顺序重发；
+        client_id 已处理过（或同一批内重复）的问题返回第一次的结果（附最新的对话记录）并带 duplicate 标记
+    """
+    items = (data or {}).get('questions')
+    if not isinstance(items, list) or not items:
+        return {'error': '缺少问题列表'}, 400
+    if len(items) > Config.MAX_BATCH_QUESTIONS:
+        return {'error': f'单次最多提交 {Config.MAX_BATCH_QUESTIONS} 个问题'}, 413
+    
+    session_id = _read_session_id(data)
+    limited = check_rate_limit(session_id)
+    if limited:
+        return _too_many_requests(*limited)
+    
+    results = [None] * len(items)
+    entries = []
+    accepted = []  # (在 items 中的位置, 是否生成回答)
+    claimed = {}   # 本批负责处理的幂等键 -> (幂等记录, 在 items 中的位置)
+    repeats = []   # 同一批内重复的 client_id：(位置, 第一次出现的位置)
+    rejected = None
+    admitted = 0   # 已占用、尚未交给 schedule_answer 的生成名额
+    try:
+        for index, item in enumerate(items):
+            item = item if isinstance(item, dict) else {}
+            client_id = item.get('client_id')
+            question = item.get('question')
+            if not isinstance(question, str) or not question.strip():
+                results[index] = {'status_code': 400, 'client_id': client_id, 'error': '问题内容不能为空'}
+                continue
+            
+            key = f"{session_id}:{client_id}" if client_id else None
+            if key in claimed:
+                repeats.append((index, claimed[key][1]))
+                continue
+            if key:
+                entry, replay = idempotency_index.claim(key)
+                if entry is None:
+                    body, status_code = replay
+                    _refresh_replay(body)
+                    results[index] = dict(body, status_code=status_code, client_id=client_id)
+                    continue
+                claimed[key] = (entry, index)
+            
+            if rejected:
+                results[index] = dict(rejected, client_id=client_id)
+                continue
+            
+            should_generate_answer = item.get('generate_answer', True) and llm_client is not None
+            if should_generate_answer and not answer_admission.try_admit():
+                logger.warning("回答生成队列已满，拒绝批量中剩余的问题")
+                body, status_code = _too_many_requests('回答生成队列已满，请稍后重试', answer_admission.retry_after())
+                rejected = dict(body, status_code=status_code)
+                results[index] = dict(rejected, client_id=client_id)
+                continue
+            if should_generate_answer:
+                admitted += 1
+            
+            entries.append({
+                'question': question.strip(),
+                'answer_status': STATUS_SKIPPED,
+                'stream_id': item.get('stream_id'),
+                'client_id': client_id,
+                'session_id': session_id
+            })
+            accepted.append((index, should_generate_answer))
+        
+        conversations = conversation_store.create_many(entries) if entries else []
+        for (index, should_generate_answer), conversation in zip(accepted, conversations):
+            if should_generate_answer:
+                # 名额交给 schedule_answer：提交失败时由它归还，否则任务结束后归还
+                admitted -= 1
+                schedule_answer(conversation)
+            results[index] = {
+                'status_code': 202 if should_generate_answer else 200,
+                'client_id': conversation['client_id'],
+                'conversation_id': conversation['id']
+            }
+    except Exception:
+        for _ in range(admitted):
+            answer_admission.release()
+        for key, (entry, _) in claimed.items():
+            idempotency_index.abort(key, entry)
+        raise
+    
+    for key, (entry, index) in claimed.items():
+        body = dict(results[index])
+        idempotency_index.complete(key, entry, body, body.pop('status_code'))
+    for index, first in repeats:
+        results[index] = dict(results[first], duplicate=True)
+    
+    if conversations:
+        logger.info(f"批量收到 {len(items)} 个问题，已创建 {len(conversations)} 条对话")
+        payload = {'session_id': session_id, 'conversations': conversations}
+        socketio.emit(
+            'new_conversations',
+            compress_socket_payload(payload, Config.HISTORY_COMPRESSION_THRESHOLD),
+            to=session_room(session_id)
+        )
+    
+    return {'success': True, 'created': len(conversations), 'results': results}, 200
+
+def _json_result(body: dict, status_code: int):
+    """把 (响应内容, 状态码) 转为 HTTP 响应，429 时设置 Retry-After 头"""
+    response = jsonify(body)
+    response.status_code = status_code
+    if status_code == 429:
+        response.headers['Retry-After'] = str(body['retry_after'])
+    return response
+
 @app.route('/api/question', methods=['POST'])
 def receive_question():
     """接收问题并生成回答"""
     try:
-        data = request.get_json()
-        
-        if not data or 'question' not in data:
-            return jsonify({'error': '缺少问题内容'}), 400
-        
-        question = data['question'].strip()
-        
-        if not question:
-            return jsonify({'error': '问题内容不能为空'}), 400
-        
-        logger.info(f"收到问题：{question}")
-        
-        # 检查是否需要生成回答（根据 generate_answer 参数）
-        should_generate_answer = data.get('generate_answer', True)
-        
-        if should_generate_answer and gemini_client:
-            # 生成 AI 回答
-            answer = gemini_client.generate_answer(question)
-            logger.info(f"生成回答：{answer[:100]}...")
-        else:
-            answer = None
-            logger.info("跳过生成回答")
-        
-        # 创建对话记录
-        conversation = {
-            'id': len(conversation_history) + 1,
-            'question': question,
-            'answer': answer,
-            'timestamp': datetime.now().isoformat(),
-            'has_answer': answer is not None
-        }
-        
-        # 保存到历史记录
-        conversation_history.append(conversation)
-        
-        # 通过 WebSocket 推送给前端
-        socketio.emit('new_conversation', conversation)
-        
-        return jsonify({
-            'success': True,
-            'conversation': conversation
-        })
+        return _json_result(*process_question(request.get_json(), request.headers.get('Idempotency-Key')))
         
     except Exception as e:
         logger.error(f"处理问题时出错：{str(e)}")
         return jsonify({'error': f'服务器错误：{str(e)}'}), 500
 
+@app.route('/api/questions/batch', methods=['POST'])
+def receive_question_batch():
+    """批量接收问题（电脑端发件箱补发积压、回放工具等）"""
+    try:
+        return _json_result(*process_question_batch(request.get_json()))
+        
+    except Exception as e:
+        logger.error(f"批量处理问题时出错：{str(e)}")
+        return jsonify({'error': f'服务器错误：{str(e)}'}), 500
+
 @app.route('/api/conversations', methods=['GET'])
 def get_conversations():
-    """获取所有对话历史"""
+    """
+    分页获取对话历史
+    
+    查询参数：after（向后翻页游标）、before（向前翻页游标）、limit（每页数量）、
+    session_id（只查询该会话，不传时查询全部会话）；游标都不传时返回最新的一页
+    """
+    try:
+        after_id = request.args.get('after', type=int)
+        before_id = request.args.get('before', type=int)
+        limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    except ValueError:
+        return jsonify({'error': '分页参数无效'}), 400
+    
+    page = build_history_page(conversation_store, after_id, before_id, limit, request.args.get('session_id'))
+    return json_response(page, request.headers.get('Accept-Encoding'), Config.HISTORY_COMPRESSION_THRESHOLD)
+
+@app.route('/api/conversations/<int:conversation_id>', methods=['GET'])
+def get_conversation(conversation_id):
+    """获取单条对话及其回答生成状态"""
+    conversation = conversation_store.get(conversation_id)
+    if not conversation:
+        return jsonify({'error': '对话记录不存在'}), 404
+    
     return jsonify({
-        'conversations': conversation_history,
-        'total': len(conversation_history)
+        'conversation': conversation,
+        'job': answer_jobs.get_job(conversation_id)
     })
 
 @socketio.on('connect')
-def handle_connect():
-    """客户端连接时的处理"""
-    logger.info(f"客户端已连接：{request.sid}")
-    
-    # 发送历史对话记录
-    emit('conversation_history', {
-        'conversations': conversation_history,
-        'total': len(conversation_history)
-    })
+def handle_connect(auth=None):
+    """
+    客户端连接时的处理
+    
+    客户端可在连接参数（auth 或查询字符串）中带上 session_id 加入该会话（默认会话为 default），
+    以及 last_seen_id，只补发之后的对话；没有带 last_seen_id 时发送最新的一页
+    """
+    session_id = _read_session_id(auth, request.args)
+    client_sessions[request.sid] = session_id
+    join_room(session_room(session_id))
+    logger.info(f"客户端已连接：{request.sid}（会话 {session_id}）")
+    
+    last_seen_id = (auth or {}).get('last_seen_id')
+    if last_seen_id is None:
+        last_seen_id = request.args.get('last_seen_id')
+    try:
+        last_seen_id = int(last_seen_id) if last_seen_id is not None else None
+    except (TypeError, ValueError):
+        last_seen_id = None
+    
+    page = build_history_page(conversation_store, after_id=last_seen_id, limit=MAX_PAGE_SIZE, session_id=session_id)
+    page['incremental'] = last_seen_id is not None
+    emit('conversation_history', compress_socket_payload(page, Config.HISTORY_COMPRESSION_THRESHOLD))
+
+@socketio.on('sync_history')
+def handle_sync_history(data):
+    """
+    分页补发对话历史
+    
+    参数：after / before 游标和 limit，与 GET /api/conversations 相同；
+    客户端在 conversation_history 的 has_more 为 True 时用 next_cursor 继续请求
+    """
+    data = data or {}
+    try:
+        after_id = int(data['after']) if data.get('after') is not None else None
+        before_id = int(data['before']) if data.get('before') is not None else None
+        limit = int(data.get('limit', MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        emit('error', {'message': '分页参数无效'})
+        return
+    
+    session_id = client_sessions.get(request.sid, DEFAULT_SESSION_ID)
+    page = build_history_page(conversation_store, after_id, before_id, limit, session_id)
+    page['incremental'] = True
+    emit('conversation_history', compress_socket_payload(page, Config.HISTORY_COMPRESSION_THRESHOLD))
+
+@socketio.on('join_session')
+def handle_join_session(data):
+    """切换到另一个会话，并发送该会话最新的一页对话"""
+    session_id = _read_session_id(data)
+    previous = client_sessions.get(request.sid)
+    if previous and previous != session_id:
+        leave_room(session_room(previous))
+    client_sessions[request.sid] = session_id
+    join_room(session_room(session_id))
+    logger.info(f"客户端 {request.sid} 切换到会话 {session_id}")
+    
+    page = build_history_page(conversation_store, limit=MAX_PAGE_SIZE, session_id=session_id)
+    page['incremental'] = False
+    emit('conversation_history', compress_socket_payload(page, Config.HISTORY_COMPRESSION_THRESHOLD))
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """客户端断开连接时的处理"""
+    client_sessions.pop(request.sid, None)
     logger.info(f"客户端已断开：{request.sid}")
 
+@socketio.on('submit_question')
+def handle_submit_question(data):
+    """
+    通过 Socket.IO 提交问题（电脑端的长连接通道），参数与 POST /api/question 相同
+    
+    Returns:
+        确认回包：POST /api/question 的响应内容加上 status_code
+    """
+    try:
+        data = dict(data or {})
+        data.setdefault('session_id', client_sessions.get(request.sid))
+        body, status_code = process_question(data)
+    except Exception as e:
+        logger.error(f"处理问题时出错：{str(e)}")
+        body, status_code = {'error': f'服务器错误：{str(e)}'}, 500
+    body['status_code'] = status_code
+    return body
+
+@socketio.on('submit_questions')
+def handle_submit_questions(data):
+    """
+    通过 Socket.IO 批量提交问题，参数与 POST /api/questions/batch 相同
+    
+    Returns:
+        确认回包：POST /api/questions/batch 的响应内容加上 status_code
+    """
+    try:
+        data = dict(data or {})
+        data.setdefault('session_id', client_sessions.get(request.sid))
+        body, status_code = process_question_batch(data)
+    except Exception as e:
+        logger.error(f"批量处理问题时出错：{str(e)}")
+        body, status_code = {'error': f'服务器错误：{str(e)}'}, 500
+    body['status_code'] = status_code
+    return body
+
 @socketio.on('request_answer')
 def handle_request_answer(data):
     """处理前端请求生成回答"""
@@ -135,11 +671,7 @@ def handle_request_answer(data):
             return
         
         # 查找对话记录
-        conversation = None
-        for conv in conversation_history:
-            if conv['id'] == conversation_id:
-                conversation = conv
-                break
+        conversation = conversation_store.get(conversation_id)
         
         if not conversation:
             emit('error', {'message': '对话记录不存在'})
@@ -149,19 +681,22 @@ def handle_request_answer(data):
             emit('error', {'message': '该问题已有回答'})
             return
         
-        if not gemini_client:
-            emit('error', {'message': 'Gemini 客户端未初始化'})
+        if not llm_client:
+            emit('error', {'message': '大模型提供商未初始化'})
             return
         
-        # 生成回答
-        answer = gemini_client.generate_answer(conversation['question'])
+        limited = check_rate_limit(client_sessions.get(request.sid, DEFAULT_SESSION_ID))
+        if limited:
+            emit('error', {'message': limited[0], 'retry_after': limited[1]})
+            return
         
-        # 更新对话记录
-        conversation['answer'] = answer
-        conversation['has_answer'] = True
+        if not answer_admission.try_admit():
+            emit('error', {'message': '回答生成队列已满，请稍后重试', 'retry_after': answer_admission.retry_after()})
+            return
         
-        # 推送更新
-        socketio.emit('conversation_updated', conversation)
+        # 异步生成回答，完成后推送 conversation_updated
+        if not schedule_answer(conversation):
+            emit('error', {'message': '该问题的回答正在生成中'})
         
     except Exception as e:
         logger.error(f"生成回答时出错：{str(e)}")
@@ -170,11 +705,11 @@ def handle_request_answer(data):
 if __name__ == '__main__':
     logger.info(f"启动服务器，地址：{Config.HOST}:{Config.PORT}")
     
-    # 测试 Gemini 连接
-    if gemini_client and gemini_client.test_connection():
-        logger.info("Gemini API 连接测试成功")
+    # 测试大模型连接
+    if llm_client and llm_client.test_connection():
+        logger.info("大模型连接测试成功")
     else:
-        logger.warning("Gemini API 连接测试失败，请检查配置")
+        logger.warning("大模型连接测试失败，请检查配置")
     
     socketio.run(
         app, 
@@ -0,0 +1,43 @@
+"""
+异步运行时适配
+eventlet 模式下所有线程都是协程，Gemini SDK（gRPC / HTTP）和句向量模型的阻塞调用不会让出，
+会卡住所有 Socket.IO 连接。这里把这些调用放到 eventlet 的真实线程池（tpool）中执行；
+threading 模式下直接调用
+"""
+
+import logging
+from typing import Any, Callable, Iterable, Iterator
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 迭代结束标记（StopIteration 不能穿过 tpool 传回）
+_DONE = object()
+
+
+def _use_tpool() -> bool:
+    return Config.SOCKETIO_ASYNC_MODE == 'eventlet'
+
+
+def run_blocking(func: Callable, *args, **kwargs) -> Any:
+    """在真实线程中执行阻塞调用，等待期间当前协程让出"""
+    if _use_tpool():
+        from eventlet import tpool
+        return tpool.execute(func, *args, **kwargs)
+    return func(*args, **kwargs)
+
+
+def iterate_blocking(iterable: Iterable) -> Iterator:
+    """逐项在真实线程中推进阻塞的迭代器（例如流式响应），每取一项都会让出当前协程"""
+    if not _use_tpool():
+        yield from iterable
+        return
+
+    from eventlet import tpool
+    iterator = tpool.execute(iter, iterable)
+    while True:
+        item = tpool.execute(next, iterator, _DONE)
+        if item is _DONE:
+            return
+        yield item
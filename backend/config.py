@@ -22,11 +22,59 @@ class Config:
     HOST = os.getenv('HOST', '0.0.0.0')
     PORT = int(os.getenv('PORT', 5001))
     
+    # 异步运行模式：eventlet（默认，协程 + 阻塞调用放到线程池）或 threading（开发调试）
+    SOCKETIO_ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE', 'eventlet')
+    # Socket.IO 消息队列（例如 redis://localhost:6379/0），多个工作进程 / 实例之间转发事件，留空为单进程
+    SOCKETIO_MESSAGE_QUEUE = os.getenv('SOCKETIO_MESSAGE_QUEUE', '')
+    # gunicorn 部署配置（见 gunicorn.conf.py）
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', 1))
+    SERVER_WORKER_CONNECTIONS = int(os.getenv('SERVER_WORKER_CONNECTIONS', 1000))
+    
     # CORS 配置
     CORS_ORIGINS = os.getenv('CORS_ORIGINS', '*').split(',')
     
+    # 大模型提供商：gemini / mock（本地模拟，离线压测用）
+    LLM_PROVIDER = os.getenv('LLM_PROVIDER', 'gemini')
+    
+    # 模拟模型配置（LLM_PROVIDER=mock）
+    MOCK_LLM_LATENCY_MS = float(os.getenv('MOCK_LLM_LATENCY_MS', 800))  # 首字延迟中位数
+    MOCK_LLM_LATENCY_SIGMA = float(os.getenv('MOCK_LLM_LATENCY_SIGMA', 0.5))  # 对数正态分布的 sigma，越大长尾越明显
+    MOCK_LLM_TOKENS_PER_SECOND = float(os.getenv('MOCK_LLM_TOKENS_PER_SECOND', 30))  # 流式输出速度，0 为不等待
+    MOCK_LLM_ANSWER_TOKENS = int(os.getenv('MOCK_LLM_ANSWER_TOKENS', 80))
+    MOCK_LLM_FAILURE_RATE = float(os.getenv('MOCK_LLM_FAILURE_RATE', 0))
+    MOCK_LLM_SEED = int(os.getenv('MOCK_LLM_SEED', 42))
+    
     # Gemini 模型配置
     GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-pro')
+    GEMINI_STREAMING = os.getenv('GEMINI_STREAMING', 'True').lower() == 'true'  # 流式推送回答（answer_delta / answer_done）
+    
+    # Gemini 调用容错
+    GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', 30))  # 秒，单次回答（含重试）的总时间预算，0 为不限制
+    GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', 2))
+    GEMINI_RETRY_BASE_DELAY = float(os.getenv('GEMINI_RETRY_BASE_DELAY', 0.5))  # 秒，指数退避的基数
+    GEMINI_RETRY_MAX_DELAY = float(os.getenv('GEMINI_RETRY_MAX_DELAY', 8))
+    GEMINI_BREAKER_THRESHOLD = int(os.getenv('GEMINI_BREAKER_THRESHOLD', 5))  # 连续失败多少次后熔断
+    GEMINI_BREAKER_RESET_TIMEOUT = float(os.getenv('GEMINI_BREAKER_RESET_TIMEOUT', 30))  # 秒，熔断后多久放行探测请求
+    GEMINI_HEDGE_PERCENTILE = float(os.getenv('GEMINI_HEDGE_PERCENTILE', 0))  # 超过该百分位延迟时发对冲请求（如 95），0 为关闭
+    
+    # 回答生成工作线程数
+    ANSWER_WORKERS = int(os.getenv('ANSWER_WORKERS', 4))
+    
+    # 回答缓存配置
+    ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'True').lower() == 'true'
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', 500))
+    ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', 86400))  # 秒，0 为不过期
+    # 语义匹配使用的本地句向量模型，留空则只做精确匹配，例如 paraphrase-multilingual-MiniLM-L12-v2
+    ANSWER_CACHE_EMBEDDING_MODEL = os.getenv('ANSWER_CACHE_EMBEDDING_MODEL', '')
+    ANSWER_CACHE_SIMILARITY_THRESHOLD = float(os.getenv('ANSWER_CACHE_SIMILARITY_THRESHOLD', 0.9))
+    
+    # 对话上下文：生成回答时带上同一会话之前的问答，总量不超过 CONTEXT_MAX_TOKENS（估算值，0 为关闭）
+    CONTEXT_MAX_TOKENS = int(os.getenv('CONTEXT_MAX_TOKENS', 1500))
+    CONTEXT_RECENT_TURNS = int(os.getenv('CONTEXT_RECENT_TURNS', 3))  # 原样保留的最近轮数
+    CONTEXT_RELEVANT_TURNS = int(os.getenv('CONTEXT_RELEVANT_TURNS', 2))  # 从更早的问答中挑选的相关轮数
+    CONTEXT_SCAN_TURNS = int(os.getenv('CONTEXT_SCAN_TURNS', 50))  # 每次最多读取的历史轮数
+    CONTEXT_TURN_MAX_TOKENS = int(os.getenv('CONTEXT_TURN_MAX_TOKENS', 300))  # 单轮问答上限，超出时截断
+    CONTEXT_SUMMARY_MAX_TOKENS = int(os.getenv('CONTEXT_SUMMARY_MAX_TOKENS', 400))  # 更早问答的摘要上限
     
     # 环境配置
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
@@ -36,11 +84,34 @@ class Config:
 
     # 对话历史配置
     SAVE_CONVERSATION_HISTORY = os.getenv('SAVE_CONVERSATION_HISTORY', 'True').lower() == 'true'
-    MAX_CONVERSATION_HISTORY = int(os.getenv('MAX_CONVERSATION_HISTORY', 100))
+    # 对话存储后端：memory / sqlite / redis；留空时 SAVE_CONVERSATION_HISTORY 为 True 用 sqlite，否则用 memory
+    CONVERSATION_STORE = os.getenv('CONVERSATION_STORE', '') or ('sqlite' if SAVE_CONVERSATION_HISTORY else 'memory')
+    MAX_CONVERSATION_HISTORY = int(os.getenv('MAX_CONVERSATION_HISTORY', 100))  # 内存存储的容量 / SQLite 存储的内存缓存条数
+    CONVERSATION_DB_PATH = os.getenv('CONVERSATION_DB_PATH', 'data/conversations.db')
+    CONVERSATION_DB_BATCH_SIZE = int(os.getenv('CONVERSATION_DB_BATCH_SIZE', 100))
+    CONVERSATION_DB_FLUSH_INTERVAL = float(os.getenv('CONVERSATION_DB_FLUSH_INTERVAL', 0.05))  # 秒，凑批等待时间
+    # 历史同步载荷超过该字节数时压缩（Socket.IO 用 zlib，HTTP 用 gzip），0 为不压缩
+    HISTORY_COMPRESSION_THRESHOLD = int(os.getenv('HISTORY_COMPRESSION_THRESHOLD', 16384))
+
+    # Redis 配置（CONVERSATION_STORE=redis 时使用；fakeredis:// 为进程内模拟，仅用于本地测试）
+    REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    REDIS_KEY_PREFIX = os.getenv('REDIS_KEY_PREFIX', 'interview')
+    REDIS_MAX_CONVERSATIONS = int(os.getenv('REDIS_MAX_CONVERSATIONS', 0))  # 0 为不限制
 
     # 安全配置
     RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'False').lower() == 'true'
+    # 每个会话（或客户端地址）每分钟的提问次数；按进程计数，多工作进程时整体上限约为该值 × SERVER_WORKERS
     MAX_REQUESTS_PER_MINUTE = int(os.getenv('MAX_REQUESTS_PER_MINUTE', 60))
+    MAX_BATCH_QUESTIONS = int(os.getenv('MAX_BATCH_QUESTIONS', 100))  # 批量提交接口单次最多的问题数（整批只计一次限流）
+
+    # 请求幂等：按 client_id / Idempotency-Key 去重的时间窗口、键数量上限和并发重复请求的最长等待
+    IDEMPOTENCY_TTL = float(os.getenv('IDEMPOTENCY_TTL', 600))  # 秒
+    IDEMPOTENCY_MAX_KEYS = int(os.getenv('IDEMPOTENCY_MAX_KEYS', 10000))
+    IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 10))  # 秒
+
+    # 准入控制：同时进行的 Gemini 调用数上限和排队数上限，超出时返回 429
+    MAX_CONCURRENT_ANSWERS = int(os.getenv('MAX_CONCURRENT_ANSWERS', ANSWER_WORKERS))
+    ANSWER_QUEUE_SIZE = int(os.getenv('ANSWER_QUEUE_SIZE', 50))
 
     # 面试助手的系统提示词
     SYSTEM_PROMPT = """你是一个专业的面试助手。你的任务是帮助用户回答面试问题。
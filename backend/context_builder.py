@@ -0,0 +1,277 @@
+"""
+对话上下文构建
+生成回答时带上同一会话之前的问答，让追问能得到连贯的回答；为控制延迟和费用，上下文不超过 token 预算：
+- 最近 N 轮问答原样保留（最能说明追问指的是什么）
+- 更早的问答按与当前问题的关键词重合度挑选最相关的几轮
+- 其余更早的问答压缩为每轮一行的摘要；摘要按会话缓存，只把新滑出最近窗口的轮次追加进去，不重复计算
+token 数用本地规则估算（中文按字、英文按词），不调用分词器
+
+is_follow_up 判断问题是否依赖之前的问答（追问），回答缓存据此决定带上下文的问题能否读写缓存
+"""
+
+import math
+import re
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Set, Tuple
+
+from answer_jobs import STATUS_PENDING, STATUS_RUNNING
+from conversation_store import DEFAULT_SESSION_ID, ConversationStore
+
+logger = logging.getLogger(__name__)
+
+_CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]')
+_WORD_RE = re.compile(r'[A-Za-z0-9_]+')
+_CJK_RUN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff]+')
+
+# 英文关键词中不计入相关度的常见词
+_STOPWORDS = {'the', 'a', 'an', 'and', 'or', 'of', 'to', 'in', 'is', 'are', 'you', 'your', 'what', 'how', 'why', 'do'}
+
+# 追问的常见说法：指代之前的内容，或要求展开 / 解释之前的回答
+_FOLLOW_UP_MARKERS = ('这个', '那个', '这些', '那些', '这种', '那种', '这样', '它', '刚才', '刚刚', '上面', '前面',
+                      '之前', '你说', '提到', '展开', '具体', '详细', '举个例子', '举例', '为什么', '然后', '还有呢', '那么')
+_FOLLOW_UP_WORDS = {'it', 'this', 'that', 'these', 'those', 'why', 'elaborate', 'example', 'mentioned',
+                    'previous', 'above', 'earlier', 'more'}
+# 估算 token 数不超过该值的问题（如“为什么？”“然后呢”）视为追问
+_FOLLOW_UP_MAX_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算 token 数：每个中日韩字符约 1 个，每个英文单词 / 数字约 1.3 个，其他符号约 0.5 个
+
+    比真实分词器略偏保守，用于预算控制足够
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    words = _WORD_RE.findall(text)
+    word_chars = sum(len(word) for word in words)
+    others = len(text) - cjk - word_chars - text.count(' ') - text.count('\n')
+    return cjk + math.ceil(len(words) * 1.3) + max(0, others) // 2
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """按估算的 token 数截断文本"""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    return text[:max(1, len(text) * max_tokens // tokens)].rstrip() + '…'
+
+
+def extract_keywords(text: str) -> Set[str]:
+    """关键词集合：中文取相邻两字，英文取小写单词（去掉常见词）"""
+    keywords = set()
+    for run in _CJK_RUN_RE.findall(text):
+        keywords.update(run[i:i + 2] for i in range(len(run) - 1))
+    for word in _WORD_RE.findall(text.lower()):
+        if len(word) > 1 and word not in _STOPWORDS:
+            keywords.add(word)
+    return keywords
+
+
+def is_follow_up(question: str) -> bool:
+    """
+    问题是否为追问（含义依赖之前的问答）
+
+    按很短的问题、指代词和承接词判断，宁可多判：误判为追问只是不用缓存，
+    漏判则可能返回或写入与当前上下文不符的缓存回答
+    """
+    text = question.strip().lower()
+    if estimate_tokens(text) <= _FOLLOW_UP_MAX_TOKENS:
+        return True
+    if any(marker in text for marker in _FOLLOW_UP_MARKERS):
+        return True
+    return any(word in _FOLLOW_UP_WORDS for word in _WORD_RE.findall(text))
+
+
+def _relevance(query: Set[str], keywords: Set[str]) -> float:
+    """两个关键词集合的余弦相似度"""
+    if not query or not keywords:
+        return 0.0
+    return len(query & keywords) / math.sqrt(len(query) * len(keywords))
+
+
+class _SessionSummary:
+    """一个会话的滚动摘要：每轮一行，超出预算时丢弃最早的行"""
+
+    def __init__(self):
+        self.upto_id = 0  # 已并入摘要的最大对话 ID
+        self.lines: 'OrderedDict[int, Tuple[str, int]]' = OrderedDict()  # 对话 ID -> (摘要行, token 数)
+        self.tokens = 0
+
+
+class ContextBuilder:
+    """按会话构建回答时使用的对话上下文"""
+
+    def __init__(self, store: ConversationStore, max_tokens: int = 1500, recent_turns: int = 3,
+                 relevant_turns: int = 2, scan_turns: int = 50, turn_max_tokens: int = 300,
+                 summary_max_tokens: int = 400, min_relevance: float = 0.15, max_sessions: int = 1000):
+        """
+        Args:
+            max_tokens: 上下文总预算（估算的 token 数）
+            recent_turns: 原样保留的最近轮数
+            relevant_turns: 从更早的对话中挑选的相关轮数
+            scan_turns: 每次最多读取的历史轮数
+            turn_max_tokens: 单轮问答的上限，超出时截断回答
+            summary_max_tokens: 缓存的摘要上限，超出时丢弃最早的行
+            min_relevance: 相关轮次的最低关键词相似度
+            max_sessions: 最多缓存摘要的会话数，按最近使用淘汰
+        """
+        self.store = store
+        self.max_tokens = max_tokens
+        self.recent_turns = max(0, recent_turns)
+        self.relevant_turns = max(0, relevant_turns)
+        self.scan_turns = max(1, scan_turns)
+        self.turn_max_tokens = turn_max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.min_relevance = min_relevance
+        self.max_sessions = max(1, max_sessions)
+
+        self._summaries: 'OrderedDict[str, _SessionSummary]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'builds': 0, 'context_tokens': 0, 'summarized_turns': 0, 'truncated': 0}
+
+    def build(self, conversation: dict) -> str:
+        """构建当前问题的上下文文本，没有历史时返回空字符串"""
+        session_id = conversation.get('session_id') or DEFAULT_SESSION_ID
+        history, _ = self.store.list(before_id=conversation['id'], limit=self.scan_turns, session_id=session_id)
+        history = [turn for turn in history if turn.get('question')]
+        if not history:
+            return ''
+
+        split = max(0, len(history) - self.recent_turns)
+        earlier, recent = history[:split], history[split:]
+
+        # 为较早的对话重新生成回答时，缓存的摘要里可能有更新的轮次，只取当前最近窗口之前的
+        window_start = recent[0]['id'] if recent else conversation['id']
+        summary_lines = [item for item in self._update_summary(session_id, earlier) if item[0] < window_start]
+
+        # 按优先级装入预算：最近的轮次（从新到旧）> 相关的更早轮次 > 摘要（从新到旧）
+        budget = self.max_tokens
+        skipped = False
+        chosen_recent = []
+        for turn in reversed(recent):
+            text, tokens = self._render_turn(turn)
+            if tokens > budget:
+                skipped = True
+                break
+            chosen_recent.append(text)
+            budget -= tokens
+        chosen_recent.reverse()
+
+        chosen_relevant = []
+        chosen_ids = set()
+        for turn in self._select_relevant(conversation.get('question', ''), earlier):
+            text, tokens = self._render_turn(turn)
+            if tokens > budget:
+                skipped = True
+                continue
+            chosen_relevant.append((turn['id'], text))
+            chosen_ids.add(turn['id'])
+            budget -= tokens
+        chosen_relevant.sort()
+
+        chosen_summary = []
+        for conversation_id, line, tokens in reversed(summary_lines):
+            if conversation_id in chosen_ids:
+                continue
+            if tokens > budget:
+                skipped = True
+                break
+            chosen_summary.append(line)
+            budget -= tokens
+        chosen_summary.reverse()
+
+        sections = []
+        if chosen_summary:
+            sections.append('【更早的对话摘要】\n' + '\n'.join(chosen_summary))
+        if chosen_relevant:
+            sections.append('【相关的历史问答】\n' + '\n\n'.join(text for _, text in chosen_relevant))
+        if chosen_recent:
+            sections.append('【最近的对话】\n' + '\n\n'.join(chosen_recent))
+        if not sections:
+            return ''
+
+        context = '以下是本场面试之前的问答，供参考（回答时与之前的内容保持一致，避免重复）：\n\n' + '\n\n'.join(sections)
+        with self._lock:
+            self._stats['builds'] += 1
+            self._stats['context_tokens'] += self.max_tokens - budget
+            if skipped:
+                self._stats['truncated'] += 1
+        logger.debug(f"对话上下文：约 {self.max_tokens - budget} tokens，"
+                     f"最近 {len(chosen_recent)} 轮，相关 {len(chosen_relevant)} 轮，摘要 {len(chosen_summary)} 行")
+        return context
+
+    def _render_turn(self, turn: dict) -> Tuple[str, int]:
+        """一轮问答的完整文本和估算的 token 数"""
+        answer = turn.get('answer') if turn.get('has_answer') else None
+        text = f"面试官：{turn['question']}"
+        if answer:
+            text += f"\n建议回答：{answer}"
+        text = truncate_to_tokens(text, self.turn_max_tokens)
+        return text, estimate_tokens(text)
+
+    def _summary_line(self, turn: dict) -> str:
+        """一轮问答的摘要：问题加回答的第一句"""
+        line = f"- 问：{truncate_to_tokens(turn['question'], 40)}"
+        answer = turn.get('answer') if turn.get('has_answer') else None
+        if answer:
+            first_sentence = re.split(r'(?<=[。！？.!?])\s*|\n', answer.strip(), maxsplit=1)[0]
+            line += f"；答：{truncate_to_tokens(first_sentence, 40)}"
+        return line
+
+    def _select_relevant(self, question: str, earlier: List[dict]) -> List[dict]:
+        """按关键词相似度从更早的轮次中挑选最相关的几轮"""
+        if not self.relevant_turns or not earlier:
+            return []
+        query = extract_keywords(question)
+        if not query:
+            return []
+        scored = []
+        for turn in earlier:
+            score = _relevance(query, extract_keywords(turn['question']))
+            if score >= self.min_relevance:
+                scored.append((score, turn['id'], turn))
+        scored.sort(key=lambda item: (-item[0], -item[1]))
+        return [turn for _, _, turn in scored[:self.relevant_turns]]
+
+    def _update_summary(self, session_id: str, earlier: List[dict]) -> List[Tuple[int, str, int]]:
+        """
+        把新滑出最近窗口的轮次追加到会话摘要中，返回 [(对话 ID, 摘要行, token 数)]
+
+        回答还在生成中的轮次等下次再并入，保证摘要里的回答是最终结果
+        """
+        with self._lock:
+            summary = self._summaries.get(session_id)
+            if summary is None:
+                summary = _SessionSummary()
+                self._summaries[session_id] = summary
+                while len(self._summaries) > self.max_sessions:
+                    self._summaries.popitem(last=False)
+            self._summaries.move_to_end(session_id)
+
+            for turn in earlier:
+                if turn['id'] <= summary.upto_id:
+                    continue
+                if turn.get('answer_status') in (STATUS_PENDING, STATUS_RUNNING):
+                    break
+                line = self._summary_line(turn)
+                tokens = estimate_tokens(line)
+                summary.lines[turn['id']] = (line, tokens)
+                summary.tokens += tokens
+                summary.upto_id = turn['id']
+                self._stats['summarized_turns'] += 1
+                while summary.tokens > self.summary_max_tokens and summary.lines:
+                    _, (_, dropped_tokens) = summary.lines.popitem(last=False)
+                    summary.tokens -= dropped_tokens
+
+            return [(conversation_id, line, tokens) for conversation_id, (line, tokens) in summary.lines.items()]
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['sessions'] = len(self._summaries)
+            stats['avg_context_tokens'] = round(stats['context_tokens'] / stats['builds'], 1) if stats['builds'] else 0
+            return stats
@@ -0,0 +1,711 @@
+"""
+对话存储
+提供按 ID 的 O(1) 查询、原子的 ID 分配、容量上限淘汰和基于游标的分页
+- InMemoryConversationStore: 内存存储，重启后丢失
+- SQLiteConversationStore: SQLite（WAL 模式）持久化存储，后台线程批量写入
+- RedisConversationStore: Redis 共享存储，多个后端进程 / 实例共用同一份对话
+"""
+
+import os
+import json
+import queue
+import bisect
+import sqlite3
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from answer_jobs import STATUS_FAILED, STATUS_PENDING, STATUS_RUNNING
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 分页默认值与上限
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# 未指定会话的对话归入默认会话
+DEFAULT_SESSION_ID = 'default'
+
+
+def _page_ids(ids, after_id: Optional[int], before_id: Optional[int], limit: int) -> Tuple[list, bool]:
+    """在升序 ID 序列（list 或 range）上按游标二分取一页"""
+    lo = bisect.bisect_right(ids, after_id) if after_id is not None else 0
+    hi = bisect.bisect_left(ids, before_id) if before_id is not None else len(ids)
+    if lo >= hi:
+        return [], False
+
+    if after_id is not None:
+        end = min(hi, lo + limit)
+        return list(ids[lo:end]), end < hi
+
+    start = max(lo, hi - limit)
+    return list(ids[start:hi]), start > lo
+
+
+def _new_conversation(conversation_id: int, question: str, fields: dict) -> dict:
+    """构造新的对话记录；fields 中没有 session_id 时归入默认会话"""
+    conversation = {
+        'id': conversation_id,
+        'question': question,
+        'answer': None,
+        'timestamp': datetime.now().isoformat(),
+        'has_answer': False
+    }
+    conversation.update(fields)
+    conversation['session_id'] = conversation.get('session_id') or DEFAULT_SESSION_ID
+    return conversation
+
+
+class ConversationStore(ABC):
+    """对话存储基类"""
+
+    @abstractmethod
+    def create(self, question: str, **fields) -> dict:
+        """分配 ID 并保存新对话，返回对话记录；fields 中没有 session_id 时归入默认会话"""
+        pass
+
+    def create_many(self, entries: List[dict]) -> List[dict]:
+        """
+        批量创建对话，分配连续的 ID 并在一次写入中保存
+
+        Args:
+            entries: 每项包含 question 和其他字段（与 create 的参数相同）
+
+        Returns:
+            对话记录，顺序与 entries 相同
+        """
+        return [self.create(**entry) for entry in entries]
+
+    @abstractmethod
+    def get(self, conversation_id: int) -> Optional[dict]:
+        """按 ID 获取对话，不存在返回 None"""
+        pass
+
+    @abstractmethod
+    def update(self, conversation_id: int, **fields) -> Optional[dict]:
+        """更新对话字段，返回更新后的记录，不存在返回 None"""
+        pass
+
+    @abstractmethod
+    def list(self, after_id: Optional[int] = None, before_id: Optional[int] = None,
+             limit: int = DEFAULT_PAGE_SIZE, session_id: Optional[str] = None) -> Tuple[List[dict], bool]:
+        """
+        按 ID 升序分页查询
+
+        Args:
+            after_id: 只返回 ID 大于该值的对话（向后翻页），从最早的记录开始
+            before_id: 只返回 ID 小于该值的对话（向前翻页），取最接近的一页
+            limit: 每页数量；两个游标都不传时返回最新的一页
+            session_id: 只查询该会话的对话，不传时查询全部会话
+
+        Returns:
+            (对话列表, 是否还有更多)
+        """
+        pass
+
+    @abstractmethod
+    def count(self, session_id: Optional[str] = None) -> int:
+        """当前保存的对话数量，传入 session_id 时只统计该会话"""
+        pass
+
+    def get_stats(self) -> dict:
+        """存储统计信息"""
+        return {'count': self.count()}
+
+    def close(self):
+        """释放资源"""
+        pass
+
+
+class InMemoryConversationStore(ConversationStore):
+    """
+    内存对话存储
+
+    ID 单调递增且只从最早的一端淘汰，所以 [最早 ID, 最新 ID] 区间内的 ID 都存在，
+    分页时可以直接按 ID 区间取数，不需要扫描；每个会话另外维护一个升序 ID 列表
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = max(1, capacity)
+        self._items: 'OrderedDict[int, dict]' = OrderedDict()
+        self._sessions: Dict[str, List[int]] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._evicted = 0
+
+    def create(self, question: str, **fields) -> dict:
+        with self._lock:
+            return self._insert(question, fields)
+
+    def create_many(self, entries: List[dict]) -> List[dict]:
+        with self._lock:
+            return [self._insert(entry['question'], {k: v for k, v in entry.items() if k != 'question'})
+                    for entry in entries]
+
+    def _insert(self, question: str, fields: dict) -> dict:
+        """保存新对话并按容量淘汰最早的记录（调用方持有锁）"""
+        conversation = _new_conversation(self._next_id, question, fields)
+        self._items[self._next_id] = conversation
+        self._sessions.setdefault(conversation['session_id'], []).append(self._next_id)
+        self._next_id += 1
+
+        while len(self._items) > self.capacity:
+            _, evicted = self._items.popitem(last=False)
+            session_ids = self._sessions[evicted['session_id']]
+            session_ids.pop(0)  # 被淘汰的一定是该会话最早的一条
+            if not session_ids:
+                del self._sessions[evicted['session_id']]
+            self._evicted += 1
+
+        return conversation
+
+    def get(self, conversation_id: int) -> Optional[dict]:
+        return self._items.get(conversation_id)
+
+    def update(self, conversation_id: int, **fields) -> Optional[dict]:
+        with self._lock:
+            conversation = self._items.get(conversation_id)
+            if conversation is not None:
+                conversation.update(fields)
+            return conversation
+
+    def list(self, after_id: Optional[int] = None, before_id: Optional[int] = None,
+             limit: int = DEFAULT_PAGE_SIZE, session_id: Optional[str] = None) -> Tuple[List[dict], bool]:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        with self._lock:
+            if session_id is not None:
+                ids = self._sessions.get(session_id, [])
+            elif self._items:
+                ids = range(next(iter(self._items)), self._next_id)
+            else:
+                ids = []
+
+            page, has_more = _page_ids(ids, after_id, before_id, limit)
+            return [self._items[i] for i in page], has_more
+
+    def count(self, session_id: Optional[str] = None) -> int:
+        if session_id is not None:
+            return len(self._sessions.get(session_id, []))
+        return len(self._items)
+
+    def get_stats(self) -> dict:
+        return {
+            'backend': 'memory',
+            'count': len(self._items),
+            'sessions': len(self._sessions),
+            'capacity': self.capacity,
+            'evicted': self._evicted
+        }
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    SQLite 对话存储
+
+    - WAL 模式，读写互不阻塞
+    - 写入只进队列，由后台线程按批次在一个事务内提交，不占用请求线程
+    - 启动时只读取最大 ID 和条数，不加载历史记录；最近的对话保留在内存缓存中
+    - 尚未落盘的记录保存在 _pending 中，查询时与数据库结果合并，保证读到最新数据
+    - 写入失败（如磁盘满、数据库被锁）时，本批 ID 重新入队，按指数退避重试
+    - 启动时把上次退出时仍在排队 / 生成中的对话标记为失败，回答任务不会跨进程恢复
+    """
+
+    # 写入失败后的重试间隔（秒）：从 RETRY_BASE_DELAY 开始翻倍，最长 RETRY_MAX_DELAY
+    RETRY_BASE_DELAY = 0.1
+    RETRY_MAX_DELAY = 5.0
+
+    def __init__(self, path: str, cache_size: int = 100, batch_size: int = 100,
+                 flush_interval: float = 0.05):
+        self.path = path
+        self.cache_size = max(1, cache_size)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # 读连接在请求线程间共享（加锁），写连接只在写线程中使用
+        self._read_conn = self._connect()
+        self._read_lock = threading.Lock()
+        self._init_schema()
+        self._fail_interrupted()
+
+        row = self._read_conn.execute('SELECT MAX(id), COUNT(*) FROM conversations').fetchone()
+        self._next_id = (row[0] or 0) + 1
+        self._count = row[1]
+        # 各会话的对话数量（走 session_id 索引，不读取对话内容）
+        self._session_counts: Dict[str, int] = dict(self._read_conn.execute(
+            'SELECT session_id, COUNT(*) FROM conversations GROUP BY session_id'
+        ).fetchall())
+
+        self._lock = threading.Lock()
+        self._cache: 'OrderedDict[int, dict]' = OrderedDict()
+        self._pending: Dict[int, dict] = {}
+
+        # 队列项为单个对话 ID，或批量创建时同一事务写入的 ID 列表；None 表示停止
+        self._queue: 'queue.Queue[Union[int, List[int], None]]' = queue.Queue()
+        self._written = 0
+        self._batches = 0
+        self._write_errors = 0
+        self._write_failures = 0  # 连续写入失败的批次数，决定重试间隔
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name='conversation-writer')
+        self._writer.daemon = True
+        self._writer.start()
+
+        logger.info(f"对话数据库：{path}，已有 {self._count} 条对话")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _init_schema(self):
+        with self._read_conn:
+            self._read_conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id INTEGER PRIMARY KEY,
+                    session_id TEXT,
+                    timestamp TEXT NOT NULL,
+                    data TEXT NOT NULL
+                )
+                """
+            )
+            self._read_conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations (timestamp)'
+            )
+            self._read_conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_conversations_session ON conversations (session_id, id)'
+            )
+
+    def _fail_interrupted(self):
+        """
+        上次退出时回答还在排队或生成中的对话标记为失败
+
+        回答任务只在进程内执行，不会在重启后恢复；不处理的话这些对话会一直显示为生成中，
+        上下文摘要也会停在第一个未完成的轮次
+        """
+        # 先按 JSON 文本粗筛（json.dumps 的默认格式），再解析确认
+        patterns = [f'%"answer_status": "{status}"%' for status in (STATUS_PENDING, STATUS_RUNNING)]
+        with self._read_conn:
+            rows = self._read_conn.execute(
+                'SELECT id, data FROM conversations WHERE data LIKE ? OR data LIKE ?', patterns
+            ).fetchall()
+            updates = []
+            for conversation_id, data in rows:
+                conversation = json.loads(data)
+                if conversation.get('answer_status') in (STATUS_PENDING, STATUS_RUNNING):
+                    conversation['answer_status'] = STATUS_FAILED
+                    updates.append((json.dumps(conversation, ensure_ascii=False), conversation_id))
+            self._read_conn.executemany('UPDATE conversations SET data = ? WHERE id = ?', updates)
+        if updates:
+            logger.warning(f"{len(updates)} 条对话的回答在上次退出时未生成完成，已标记为失败")
+
+    def create(self, question: str, **fields) -> dict:
+        with self._lock:
+            conversation = self._insert(question, fields)
+            self._enqueue(conversation)
+            return conversation
+
+    def create_many(self, entries: List[dict]) -> List[dict]:
+        """整批作为一个写入项入队，由写线程在同一个事务内提交"""
+        with self._lock:
+            conversations = [
+                self._insert(entry['question'], {k: v for k, v in entry.items() if k != 'question'})
+                for entry in entries
+            ]
+            for conversation in conversations:
+                self._pending[conversation['id']] = dict(conversation)
+            if conversations:
+                self._queue.put([conversation['id'] for conversation in conversations])
+            return conversations
+
+    def _insert(self, question: str, fields: dict) -> dict:
+        """分配 ID 并更新计数和缓存（调用方持有锁）"""
+        conversation = _new_conversation(self._next_id, question, fields)
+        self._next_id += 1
+        self._count += 1
+        self._session_counts[conversation['session_id']] = self._session_counts.get(conversation['session_id'], 0) + 1
+        self._remember(conversation)
+        return conversation
+
+    def get(self, conversation_id: int) -> Optional[dict]:
+        with self._lock:
+            conversation = self._cache.get(conversation_id) or self._pending.get(conversation_id)
+            if conversation is not None:
+                return conversation
+
+        with self._read_lock:
+            row = self._read_conn.execute(
+                'SELECT data FROM conversations WHERE id = ?', (conversation_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update(self, conversation_id: int, **fields) -> Optional[dict]:
+        conversation = self.get(conversation_id)
+        if conversation is None:
+            return None
+
+        with self._lock:
+            conversation.update(fields)
+            self._remember(conversation)
+            self._enqueue(conversation)
+            return conversation
+
+    def list(self, after_id: Optional[int] = None, before_id: Optional[int] = None,
+             limit: int = DEFAULT_PAGE_SIZE, session_id: Optional[str] = None) -> Tuple[List[dict], bool]:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        ascending = after_id is not None
+
+        conditions, params = [], []
+        if session_id is not None:
+            conditions.append('session_id = ?')
+            params.append(session_id)
+        if after_id is not None:
+            conditions.append('id > ?')
+            params.append(after_id)
+        if before_id is not None:
+            conditions.append('id < ?')
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        order = 'ASC' if ascending else 'DESC'
+
+        # 多取一条用来判断是否还有更多
+        with self._read_lock:
+            rows = self._read_conn.execute(
+                f'SELECT id, data FROM conversations {where} ORDER BY id {order} LIMIT ?',
+                (*params, limit + 1)
+            ).fetchall()
+        merged = {row[0]: json.loads(row[1]) for row in rows}
+
+        # 合并尚未落盘的记录；内存缓存中的对话是最新状态（回答生成任务原地更新），优先使用
+        with self._lock:
+            for conversation_id, conversation in self._pending.items():
+                if after_id is not None and conversation_id <= after_id:
+                    continue
+                if before_id is not None and conversation_id >= before_id:
+                    continue
+                if session_id is not None and conversation['session_id'] != session_id:
+                    continue
+                merged[conversation_id] = dict(conversation)
+            for conversation_id in merged:
+                live = self._cache.get(conversation_id)
+                if live is not None:
+                    merged[conversation_id] = dict(live)
+
+        ids = sorted(merged, reverse=not ascending)[:limit + 1]
+        has_more = len(ids) > limit
+        ids = sorted(ids[:limit])
+        return [merged[i] for i in ids], has_more
+
+    def count(self, session_id: Optional[str] = None) -> int:
+        if session_id is not None:
+            return self._session_counts.get(session_id, 0)
+        return self._count
+
+    def flush(self, timeout: Optional[float] = None):
+        """等待队列中的写入全部提交"""
+        deadline = time.time() + timeout if timeout is not None else None
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.time() > deadline:
+                break
+            time.sleep(0.01)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout=10)
+        with self._read_lock:
+            self._read_conn.close()
+
+    def get_stats(self) -> dict:
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'count': self._count,
+            'sessions': len(self._session_counts),
+            'cached': len(self._cache),
+            'pending_writes': len(self._pending),
+            'written': self._written,
+            'batches': self._batches,
+            'write_errors': self._write_errors
+        }
+
+    def _remember(self, conversation: dict):
+        """放入最近对话缓存（调用方持有锁）"""
+        self._cache[conversation['id']] = conversation
+        self._cache.move_to_end(conversation['id'])
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _enqueue(self, conversation: dict):
+        """记录待写入的快照（调用方持有锁）；同一对话多次更新只写最后一次"""
+        self._pending[conversation['id']] = dict(conversation)
+        self._queue.put(conversation['id'])
+
+    def _write_loop(self):
+        conn = self._connect()
+        stopping = False
+
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+            # 凑批：在 flush_interval 内尽量多取
+            items = [item]
+            deadline = time.time() + self.flush_interval
+            while len(items) < self.batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            stopping = None in items
+            conversation_ids = set()
+            for item in items:
+                if isinstance(item, list):
+                    conversation_ids.update(item)
+                elif item is not None:
+                    conversation_ids.add(item)
+            if not self._write_batch(conn, conversation_ids):
+                if stopping:
+                    logger.error(f"关闭时仍有 {len(conversation_ids)} 条对话未能写入数据库")
+                else:
+                    # 先重新入队再标记完成，flush() 会继续等待这些对话写入
+                    delay = min(self.RETRY_MAX_DELAY, self.RETRY_BASE_DELAY * (2 ** (self._write_failures - 1)))
+                    logger.warning(f"{len(conversation_ids)} 条对话将在 {delay:.1f} 秒后重新写入")
+                    self._queue.put(sorted(conversation_ids))
+                    time.sleep(delay)
+            for _ in items:
+                self._queue.task_done()
+
+        conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, conversation_ids: set) -> bool:
+        """写入一批对话，返回是否成功（失败时快照保留在 _pending 中）"""
+        with self._lock:
+            snapshots = [self._pending[i] for i in conversation_ids if i in self._pending]
+        if not snapshots:
+            return True
+
+        try:
+            with conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO conversations (id, session_id, timestamp, data) VALUES (?, ?, ?, ?)',
+                    [
+                        (c['id'], c.get('session_id'), c['timestamp'], json.dumps(c, ensure_ascii=False))
+                        for c in snapshots
+                    ]
+                )
+            self._written += len(snapshots)
+            self._batches += 1
+            self._write_failures = 0
+        except sqlite3.Error as e:
+            self._write_errors += 1
+            self._write_failures += 1
+            logger.error(f"写入对话数据库失败：{str(e)}")
+            return False
+
+        # 写入期间又有更新的对话保留在 _pending 中，等下一批写入
+        with self._lock:
+            for snapshot in snapshots:
+                if self._pending.get(snapshot['id']) is snapshot:
+                    del self._pending[snapshot['id']]
+        return True
+
+
+class RedisConversationStore(ConversationStore):
+    """
+    Redis 对话存储
+
+    键结构（prefix 默认为 interview）：
+    - {prefix}:next_id         INCR 分配全局唯一 ID
+    - {prefix}:conv:{id}       哈希，每个字段保存 JSON 编码的值，更新单个字段不需要读改写
+    - {prefix}:ids             有序集合（score 为 ID），全局分页
+    - {prefix}:session:{sid}   有序集合，按会话分页
+    - {prefix}:sessions        会话 ID 集合
+
+    多个进程共用同一份数据，某个进程启动时无法判断其他进程的回答任务是否还在进行，
+    因此不像 SQLiteConversationStore 那样在启动时把生成中的对话标记为失败
+    """
+
+    def __init__(self, client, prefix: str = 'interview', max_entries: int = 0):
+        """
+        Args:
+            client: redis.Redis 兼容的客户端（也可以是 fakeredis.FakeRedis）
+            max_entries: 最多保留的对话条数，超出后删除最早的记录；0 为不限制
+        """
+        self.client = client
+        self.prefix = prefix
+        self.max_entries = max_entries
+
+    def _key(self, *parts) -> str:
+        return ':'.join((self.prefix,) + tuple(str(p) for p in parts))
+
+    @staticmethod
+    def _encode(fields: dict) -> dict:
+        return {k: json.dumps(v, ensure_ascii=False) for k, v in fields.items()}
+
+    @staticmethod
+    def _decode(raw: dict) -> Optional[dict]:
+        if not raw:
+            return None
+        return {
+            (k.decode() if isinstance(k, bytes) else k): json.loads(v)
+            for k, v in raw.items()
+        }
+
+    def create(self, question: str, **fields) -> dict:
+        conversation_id = int(self.client.incr(self._key('next_id')))
+        conversation = _new_conversation(conversation_id, question, fields)
+        session_id = conversation['session_id']
+
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(self._key('conv', conversation_id), mapping=self._encode(conversation))
+        pipe.zadd(self._key('ids'), {conversation_id: conversation_id})
+        pipe.zadd(self._key('session', session_id), {conversation_id: conversation_id})
+        pipe.sadd(self._key('sessions'), session_id)
+        pipe.execute()
+
+        if self.max_entries and conversation_id > self.max_entries:
+            self._evict(conversation_id - self.max_entries)
+        return conversation
+
+    def create_many(self, entries: List[dict]) -> List[dict]:
+        """INCRBY 一次分配连续的 ID，所有写入在同一个 MULTI 事务中提交"""
+        if not entries:
+            return []
+        last_id = int(self.client.incrby(self._key('next_id'), len(entries)))
+        first_id = last_id - len(entries) + 1
+
+        conversations = []
+        pipe = self.client.pipeline(transaction=True)
+        for conversation_id, entry in enumerate(entries, start=first_id):
+            conversation = _new_conversation(
+                conversation_id, entry['question'], {k: v for k, v in entry.items() if k != 'question'}
+            )
+            session_id = conversation['session_id']
+            pipe.hset(self._key('conv', conversation_id), mapping=self._encode(conversation))
+            pipe.zadd(self._key('ids'), {conversation_id: conversation_id})
+            pipe.zadd(self._key('session', session_id), {conversation_id: conversation_id})
+            pipe.sadd(self._key('sessions'), session_id)
+            conversations.append(conversation)
+        pipe.execute()
+
+        if self.max_entries:
+            for conversation_id in range(max(1, first_id - self.max_entries), last_id - self.max_entries + 1):
+                self._evict(conversation_id)
+        return conversations
+
+    def _evict(self, conversation_id: int):
+        """删除一条旧对话（ID 连续分配，每新增一条淘汰一条）"""
+        session_id = self.client.hget(self._key('conv', conversation_id), 'session_id')
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(self._key('conv', conversation_id))
+        pipe.zrem(self._key('ids'), conversation_id)
+        if session_id is not None:
+            pipe.zrem(self._key('session', json.loads(session_id)), conversation_id)
+        pipe.execute()
+
+    def get(self, conversation_id: int) -> Optional[dict]:
+        return self._decode(self.client.hgetall(self._key('conv', conversation_id)))
+
+    def update(self, conversation_id: int, **fields) -> Optional[dict]:
+        key = self._key('conv', conversation_id)
+        if not self.client.exists(key):
+            return None
+        if fields:
+            self.client.hset(key, mapping=self._encode(fields))
+        return self.get(conversation_id)
+
+    def list(self, after_id: Optional[int] = None, before_id: Optional[int] = None,
+             limit: int = DEFAULT_PAGE_SIZE, session_id: Optional[str] = None) -> Tuple[List[dict], bool]:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        index = self._key('session', session_id) if session_id is not None else self._key('ids')
+        low = f"({after_id}" if after_id is not None else '-inf'
+        high = f"({before_id}" if before_id is not None else '+inf'
+
+        # 多取一条用来判断是否还有更多
+        if after_id is not None:
+            ids = self.client.zrangebyscore(index, low, high, start=0, num=limit + 1)
+        else:
+            ids = self.client.zrevrangebyscore(index, high, low, start=0, num=limit + 1)
+        has_more = len(ids) > limit
+        ids = sorted(int(i) for i in ids[:limit])
+
+        pipe = self.client.pipeline(transaction=False)
+        for conversation_id in ids:
+            pipe.hgetall(self._key('conv', conversation_id))
+        conversations = [c for c in (self._decode(raw) for raw in pipe.execute()) if c]
+        return conversations, has_more
+
+    def count(self, session_id: Optional[str] = None) -> int:
+        if session_id is not None:
+            return int(self.client.zcard(self._key('session', session_id)))
+        return int(self.client.zcard(self._key('ids')))
+
+    def get_stats(self) -> dict:
+        return {
+            'backend': 'redis',
+            'count': self.count(),
+            'sessions': int(self.client.scard(self._key('sessions'))),
+            'max_entries': self.max_entries
+        }
+
+    def close(self):
+        self.client.close()
+
+
+def create_redis_client(url: str):
+    """创建 Redis 客户端；url 为 fakeredis:// 时使用进程内的 fakeredis（本地测试用）"""
+    if url.startswith('fakeredis://'):
+        try:
+            import fakeredis
+        except ImportError:
+            logger.error("未安装 fakeredis，请运行: pip install fakeredis")
+            raise
+        return fakeredis.FakeRedis()
+
+    try:
+        import redis
+    except ImportError:
+        logger.error("未安装 redis，请运行: pip install redis")
+        raise
+    return redis.Redis.from_url(url)
+
+
+def create_conversation_store() -> ConversationStore:
+    """根据配置创建对话存储"""
+    if Config.CONVERSATION_STORE == 'redis':
+        logger.info(f"对话存储：Redis，地址 {Config.REDIS_URL}")
+        return RedisConversationStore(
+            create_redis_client(Config.REDIS_URL),
+            prefix=Config.REDIS_KEY_PREFIX,
+            max_entries=Config.REDIS_MAX_CONVERSATIONS
+        )
+
+    if Config.CONVERSATION_STORE == 'sqlite':
+        logger.info(f"对话存储：SQLite，数据库 {Config.CONVERSATION_DB_PATH}")
+        return SQLiteConversationStore(
+            Config.CONVERSATION_DB_PATH,
+            cache_size=Config.MAX_CONVERSATION_HISTORY,
+            batch_size=Config.CONVERSATION_DB_BATCH_SIZE,
+            flush_interval=Config.CONVERSATION_DB_FLUSH_INTERVAL
+        )
+
+    logger.info(f"对话存储：内存，容量 {Config.MAX_CONVERSATION_HISTORY}")
+    return InMemoryConversationStore(Config.MAX_CONVERSATION_HISTORY)
@@ -0,0 +1,37 @@
+"""
+gunicorn 生产部署配置
+
+启动：cd backend && gunicorn -c gunicorn.conf.py
+
+- 使用 eventlet 工作进程，每个进程用协程处理 SERVER_WORKER_CONNECTIONS 个并发连接，
+  Gemini 调用等阻塞操作在线程池中执行（见 async_runtime.py）
+- gunicorn 的负载均衡不支持会话粘滞，Socket.IO 的长轮询握手需要落在同一进程上，
+  因此 SERVER_WORKERS 大于 1 时必须配置 SOCKETIO_MESSAGE_QUEUE 和 CONVERSATION_STORE=redis，
+  且客户端只使用 websocket 传输；
+  否则请保持 1 个工作进程，通过多个实例 + 支持粘滞会话的反向代理（如 nginx ip_hash）扩展
+- 限流（RATE_LIMIT_ENABLED）、生成准入和幂等索引都在进程内计数，多工作进程时整体限额约为配置值 × 进程数，
+  需要严格的全局限流时请在反向代理层配置
+"""
+
+from config import Config
+
+wsgi_app = 'app:app'
+bind = f"{Config.HOST}:{Config.PORT}"
+
+worker_class = 'eventlet'
+workers = Config.SERVER_WORKERS
+worker_connections = Config.SERVER_WORKER_CONNECTIONS
+
+# 流式回答期间连接一直保持，超时时间需覆盖最慢的一次生成
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+loglevel = Config.LOG_LEVEL.lower()
+
+if workers > 1 and not Config.SOCKETIO_MESSAGE_QUEUE:
+    raise RuntimeError("SERVER_WORKERS 大于 1 时需要配置 SOCKETIO_MESSAGE_QUEUE")
+if workers > 1 and Config.CONVERSATION_STORE != 'redis':
+    raise RuntimeError("SERVER_WORKERS 大于 1 时需要使用共享的对话存储（CONVERSATION_STORE=redis）")
@@ -0,0 +1,71 @@
+"""
+对话历史同步
+客户端重连时只补发缺失的对话（按 last_seen_id 游标），较大的批次压缩后发送
+"""
+
+import gzip
+import json
+import zlib
+from typing import Optional
+
+from flask import Response, jsonify
+
+from conversation_store import ConversationStore, DEFAULT_PAGE_SIZE
+
+# Socket.IO 压缩载荷的编码标识，客户端据此解压 data 字段
+SOCKET_ENCODING_ZLIB = 'zlib'
+
+
+def build_history_page(store: ConversationStore, after_id: Optional[int] = None,
+                       before_id: Optional[int] = None, limit: int = DEFAULT_PAGE_SIZE,
+                       session_id: Optional[str] = None) -> dict:
+    """
+    查询一页对话历史（传入 session_id 时只查询该会话）
+
+    Returns:
+        dict: {'conversations', 'total', 'has_more', 'next_cursor', 'prev_cursor'}；
+              next_cursor 为本页最后一条的 ID，作为下一次请求的 after
+    """
+    conversations, has_more = store.list(after_id=after_id, before_id=before_id, limit=limit, session_id=session_id)
+    return {
+        'session_id': session_id,
+        'conversations': conversations,
+        'total': store.count(session_id),
+        'has_more': has_more,
+        'next_cursor': conversations[-1]['id'] if conversations else after_id,
+        'prev_cursor': conversations[0]['id'] if conversations else before_id
+    }
+
+
+def compress_socket_payload(payload: dict, threshold: int) -> dict:
+    """
+    序列化后超过 threshold 字节时压缩为 {'encoding': 'zlib', 'data': bytes}
+
+    bytes 作为 Socket.IO 二进制附件发送，不需要 base64；threshold 为 0 时不压缩
+    """
+    if threshold <= 0:
+        return payload
+
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    if len(body) <= threshold:
+        return payload
+
+    return {
+        'encoding': SOCKET_ENCODING_ZLIB,
+        'data': zlib.compress(body)
+    }
+
+
+def json_response(payload: dict, accept_encoding: str, threshold: int) -> Response:
+    """超过 threshold 字节且客户端支持 gzip 时返回压缩后的 JSON 响应"""
+    if threshold <= 0 or 'gzip' not in (accept_encoding or ''):
+        return jsonify(payload)
+
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    if len(body) <= threshold:
+        return jsonify(payload)
+
+    response = Response(gzip.compress(body), mimetype='application/json')
+    response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
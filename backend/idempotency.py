@@ -0,0 +1,129 @@
+"""
+请求幂等
+客户端为每个问题生成 client_id（或在 HTTP 请求头中带 Idempotency-Key），超时重试时复用同一个 ID：
+- 时间窗口内已成功处理过的 ID 直接返回第一次的结果，不再创建对话、不再调用大模型
+- 同一 ID 的并发请求只有第一个真正执行，其余等待它完成后共享结果
+- 记录数量有上限，超过时间窗口或上限后按最早写入淘汰
+
+索引只在当前进程内；多工作进程部署时同一 ID 的重试可能落到不同进程
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+# (响应内容, 状态码)
+Result = Tuple[dict, int]
+
+
+def _snapshot(body: dict) -> dict:
+    """
+    复制响应内容（包括嵌套的对话记录）
+
+    对话记录在回答生成期间会被工作线程修改；dict() 在 C 层一次性复制，不会在迭代中途遇到修改
+    """
+    return {k: dict(v) if isinstance(v, dict) else v for k, v in body.items()}
+
+
+class _Entry:
+    """一个幂等键的处理状态"""
+
+    __slots__ = ('created_at', 'done', 'result')
+
+    def __init__(self):
+        self.created_at = time.monotonic()
+        self.done = threading.Event()
+        self.result: Optional[Result] = None
+
+
+class IdempotencyIndex:
+    """幂等键索引（带时间窗口的 LRU）"""
+
+    def __init__(self, ttl: float = 600, max_entries: int = 10000, wait_timeout: float = 10):
+        """
+        Args:
+            ttl: 成功结果的保留时间（秒）
+            max_entries: 最多保留的键数量
+            wait_timeout: 并发重复请求等待第一个请求完成的最长时间（秒）
+        """
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.wait_timeout = wait_timeout
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'replayed': 0, 'coalesced': 0, 'wait_timeouts': 0}
+
+    def claim(self, key: str) -> Tuple[Optional[_Entry], Optional[Result]]:
+        """
+        占用幂等键
+
+        Returns:
+            (entry, None)：调用方负责处理请求，完成后必须调用 complete 或 abort；
+            (None, result)：重复请求，直接返回 result（已带 duplicate 标记，超时等待时为 409）
+        """
+        waited = False
+        while True:
+            with self._lock:
+                self._purge()
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = _Entry()
+                    self._entries[key] = entry
+                    return entry, None
+                if entry.result is not None:
+                    self._stats['coalesced' if waited else 'replayed'] += 1
+                    body, status_code = entry.result
+                    return None, (dict(_snapshot(body), duplicate=True), status_code)
+
+            # 第一个请求还在处理中：等待它完成；它失败时会移除该键，下一轮由当前请求重新处理
+            waited = True
+            if not entry.done.wait(self.wait_timeout):
+                with self._lock:
+                    self._stats['wait_timeouts'] += 1
+                return None, ({'error': '相同的请求正在处理中，请稍后重试', 'duplicate': True}, 409)
+
+    def complete(self, key: str, entry: _Entry, body: dict, status_code: int):
+        """记录处理结果；只保留成功（2xx）的结果，失败的请求允许客户端重试"""
+        with self._lock:
+            if 200 <= status_code < 300:
+                entry.result = (_snapshot(body), status_code)
+            elif self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def abort(self, key: str, entry: _Entry):
+        """处理出错，释放幂等键"""
+        with self._lock:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+        entry.done.set()
+
+    def run(self, key: str, func: Callable[[], Result]) -> Result:
+        """以 key 为幂等键执行 func，重复请求返回第一次的结果"""
+        entry, result = self.claim(key)
+        if entry is None:
+            return result
+        try:
+            body, status_code = func()
+        except Exception:
+            self.abort(key, entry)
+            raise
+        self.complete(key, entry, body, status_code)
+        return body, status_code
+
+    def _purge(self):
+        """淘汰过期和超出数量上限的键（调用方持有锁）；键按写入时间排列，只需检查最早的一端"""
+        now = time.monotonic()
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if len(self._entries) <= self.max_entries and now - entry.created_at < self.ttl:
+                break
+            del self._entries[key]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['keys'] = len(self._entries)
+            stats['in_flight'] = sum(1 for entry in self._entries.values() if entry.result is None)
+            return stats
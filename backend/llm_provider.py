@@ -0,0 +1,287 @@
+"""
+大模型提供商
+- GeminiProvider: Google Gemini
+- MockLLMProvider: 本地模拟模型，回答确定、延迟和流式速度可配置，用于离线压测整条链路
+"""
+
+import hashlib
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from config import Config
+import logging
+from typing import Iterator, Optional, Tuple
+
+from async_runtime import run_blocking, iterate_blocking
+from resilience import CircuitBreaker, ResilientCaller
+
+logger = logging.getLogger(__name__)
+
+# 模型返回空响应时的兜底回答
+EMPTY_ANSWER = "抱歉，我暂时无法为这个问题提供回答建议。"
+
+# 可重试的错误（google.api_core.exceptions 中的类名），按类名判断以免直接依赖 api_core
+RETRYABLE_ERRORS = {
+    'ServiceUnavailable', 'DeadlineExceeded', 'ResourceExhausted', 'TooManyRequests',
+    'InternalServerError', 'GatewayTimeout', 'BadGateway', 'Aborted'
+}
+
+def is_retryable_error(error: Exception) -> bool:
+    """网络错误和服务端临时错误可以重试"""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+class LLMProvider(ABC):
+    """大模型提供商基类"""
+    
+    name = ''
+    
+    @abstractmethod
+    def generate_answer(self, question: str, raise_errors: bool = False, context: str = '') -> str:
+        """
+        根据面试问题生成回答
+        
+        Args:
+            question (str): 面试官的问题
+            raise_errors (bool): 调用失败时抛出异常，而不是返回错误提示文本
+            context (str): 同一会话之前的问答（由 ContextBuilder 构建），为空时只发送问题
+            
+        Returns:
+            str: AI 生成的回答建议
+        """
+        pass
+    
+    def generate_answer_stream(self, question: str, context: str = '') -> Iterator[str]:
+        """流式生成回答，逐块返回文本；默认一次性返回完整回答，支持流式的提供商覆盖此方法"""
+        yield self.generate_answer(question, raise_errors=True, context=context)
+    
+    @abstractmethod
+    def test_connection(self) -> bool:
+        """测试连接是否正常"""
+        pass
+    
+    def get_stats(self) -> dict:
+        """调用统计信息"""
+        return {}
+    
+    @staticmethod
+    def _create_caller() -> ResilientCaller:
+        """按配置创建容错调用器（截止时间、重试、熔断、对冲）"""
+        return ResilientCaller(
+            timeout=Config.GEMINI_TIMEOUT,
+            max_retries=Config.GEMINI_MAX_RETRIES,
+            base_delay=Config.GEMINI_RETRY_BASE_DELAY,
+            max_delay=Config.GEMINI_RETRY_MAX_DELAY,
+            breaker=CircuitBreaker(Config.GEMINI_BREAKER_THRESHOLD, Config.GEMINI_BREAKER_RESET_TIMEOUT),
+            hedge_percentile=Config.GEMINI_HEDGE_PERCENTILE or None,
+            is_retryable=is_retryable_error
+        )
+    
+    def _build_prompt(self, question: str, context: str = '') -> str:
+        """构建完整的提示词（有对话上下文时放在系统提示词和当前问题之间）"""
+        if context:
+            return f"{Config.SYSTEM_PROMPT}\n\n{context}\n\n面试官问题：{question}\n\n请提供回答建议："
+        return f"{Config.SYSTEM_PROMPT}\n\n面试官问题：{question}\n\n请提供回答建议："
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini"""
+    
+    name = 'gemini'
+    
+    def __init__(self):
+        """初始化 Gemini 客户端"""
+        if not Config.GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY 未设置，请在 .env 文件中配置")
+        
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            logger.error("未安装 google-generativeai，请运行: pip install google-generativeai")
+            raise
+        
+        genai.configure(api_key=Config.GEMINI_API_KEY)
+        self.model = genai.GenerativeModel(Config.GEMINI_MODEL)
+        
+        # 截止时间、重试、熔断和对冲
+        self.caller = self._create_caller()
+        
+    def generate_answer(self, question: str, raise_errors: bool = False, context: str = '') -> str:
+        try:
+            # 构建完整的提示词
+            full_prompt = self._build_prompt(question, context)
+            
+            # 调用 Gemini API（阻塞调用在线程池中执行）
+            response = self.caller.call(lambda: run_blocking(self.model.generate_content, full_prompt))
+            
+            if response.text:
+                logger.info(f"成功生成回答，问题：{question[:50]}...")
+                return response.text.strip()
+            else:
+                logger.warning("Gemini API 返回空响应")
+                return EMPTY_ANSWER
+                
+        except Exception as e:
+            logger.error(f"调用 Gemini API 失败：{str(e)}")
+            if raise_errors:
+                raise
+            return f"生成回答时出现错误：{str(e)}"
+    
+    def generate_answer_stream(self, question: str, context: str = '') -> Iterator[str]:
+        """
+        流式生成回答，逐块返回文本
+        
+        发起请求到收到第一块文本的过程受截止时间、重试和熔断保护（对冲只用于非流式调用）；
+        开始输出后不再重试
+        
+        Args:
+            question (str): 面试官的问题
+            context (str): 同一会话之前的问答
+            
+        Yields:
+            str: 回答的增量文本
+        """
+        prompt = self._build_prompt(question, context)
+        first_text, chunks = self.caller.call(lambda: run_blocking(self._open_stream, prompt), hedge=False)
+        
+        if first_text is None:
+            logger.warning("Gemini API 返回空响应")
+            yield EMPTY_ANSWER
+            return
+        
+        yield first_text
+        for chunk in iterate_blocking(chunks):
+            text = self._chunk_text(chunk)
+            if text:
+                yield text
+        
+        logger.info(f"流式生成回答完成，问题：{question[:50]}...")
+    
+    def _open_stream(self, prompt: str) -> Tuple[Optional[str], Iterator]:
+        """发起流式请求并读到第一块文本，返回 (第一块文本, 剩余块的迭代器)；没有文本时第一块为 None"""
+        chunks = iter(self.model.generate_content(prompt, stream=True))
+        for chunk in chunks:
+            text = self._chunk_text(chunk)
+            if text:
+                return text, chunks
+        return None, iter(())
+    
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        try:
+            return chunk.text
+        except ValueError:
+            # 被安全过滤等原因拦截的块没有文本
+            return ''
+    
+    def get_stats(self) -> dict:
+        """调用次数、重试、超时、对冲和熔断状态"""
+        return self.caller.get_stats()
+    
+    def test_connection(self) -> bool:
+        """
+        测试 Gemini API 连接
+        
+        Returns:
+            bool: 连接是否成功
+        """
+        try:
+            response = self.model.generate_content("Hello")
+            return bool(response.text)
+        except Exception as e:
+            logger.error(f"Gemini API 连接测试失败：{str(e)}")
+            return False
+
+class MockLLMProvider(LLMProvider):
+    """
+    本地模拟模型，不访问网络
+    
+    - 同一个问题总是得到相同的回答（按问题哈希生成）
+    - 首个字的延迟服从对数正态分布（中位数 MOCK_LLM_LATENCY_MS，离散程度 MOCK_LLM_LATENCY_SIGMA）
+    - 流式输出按 MOCK_LLM_TOKENS_PER_SECOND 的速度逐词返回
+    - 按 MOCK_LLM_FAILURE_RATE 的概率抛出 ConnectionError，和 Gemini 一样经过容错调用器，用于验证重试和熔断
+    """
+    
+    name = 'mock'
+    
+    # 用于拼接模拟回答的词表
+    _WORDS = (
+        '首先', '我', '在', '上一份', '工作', '中', '负责', '核心', '系统', '的', '设计', '与', '优化',
+        '通过', '引入', '缓存', '和', '异步', '处理', '把', '响应', '时间', '降低', '了', '一半',
+        '其次', '团队', '协作', '方面', '推动', '代码', '评审', '自动化', '测试', '最后', '持续', '学习'
+    )
+    
+    def __init__(self, latency_ms: float = None, latency_sigma: float = None, tokens_per_second: float = None,
+                 answer_tokens: int = None, failure_rate: float = None, seed: int = None):
+        self.latency_ms = Config.MOCK_LLM_LATENCY_MS if latency_ms is None else latency_ms
+        self.latency_sigma = Config.MOCK_LLM_LATENCY_SIGMA if latency_sigma is None else latency_sigma
+        self.tokens_per_second = Config.MOCK_LLM_TOKENS_PER_SECOND if tokens_per_second is None else tokens_per_second
+        self.answer_tokens = Config.MOCK_LLM_ANSWER_TOKENS if answer_tokens is None else answer_tokens
+        self.failure_rate = Config.MOCK_LLM_FAILURE_RATE if failure_rate is None else failure_rate
+        # 固定种子使延迟和失败序列可复现
+        self._random = random.Random(Config.MOCK_LLM_SEED if seed is None else seed)
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._failures = 0
+        self.caller = self._create_caller()
+        logger.info(f"使用模拟大模型：首字延迟中位数 {self.latency_ms:.0f} ms，{self.tokens_per_second:.0f} 词/秒")
+    
+    def _tokens(self, question: str) -> list:
+        """按问题哈希确定性地生成回答"""
+        seed = int(hashlib.sha256(question.encode('utf-8')).hexdigest()[:8], 16)
+        rng = random.Random(seed)
+        return [f"（模拟回答）关于「{question[:20]}」："] + [rng.choice(self._WORDS) for _ in range(self.answer_tokens)]
+    
+    def _wait_first_token(self):
+        """模拟首字延迟和随机失败"""
+        with self._lock:
+            self._calls += 1
+            delay = self._random.lognormvariate(0, self.latency_sigma) * self.latency_ms / 1000.0
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self._failures += 1
+        time.sleep(delay)
+        if failed:
+            raise ConnectionError("模拟大模型调用失败")
+    
+    def generate_answer(self, question: str, raise_errors: bool = False, context: str = '') -> str:
+        # 模拟回答只由问题决定，context 不影响输出
+        try:
+            self.caller.call(self._wait_first_token)
+            tokens = self._tokens(question)
+            if self.tokens_per_second > 0:
+                time.sleep(len(tokens) / self.tokens_per_second)
+            return ''.join(tokens)
+        except Exception as e:
+            logger.error(f"调用模拟大模型失败：{str(e)}")
+            if raise_errors:
+                raise
+            return f"生成回答时出现错误：{str(e)}"
+    
+    def generate_answer_stream(self, question: str, context: str = '') -> Iterator[str]:
+        self.caller.call(self._wait_first_token, hedge=False)
+        interval = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        for index, token in enumerate(self._tokens(question)):
+            if index and interval:
+                time.sleep(interval)
+            yield token
+    
+    def test_connection(self) -> bool:
+        return True
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = {'mock_calls': self._calls, 'mock_failures': self._failures}
+        stats.update(self.caller.get_stats())
+        return stats
+
+def create_llm_provider() -> LLMProvider:
+    """根据配置创建大模型提供商"""
+    provider_name = Config.LLM_PROVIDER.lower()
+    
+    if provider_name == 'mock':
+        return MockLLMProvider()
+    if provider_name != 'gemini':
+        logger.warning(f"未知的大模型提供商：{provider_name}，使用 Gemini")
+    return GeminiProvider()
@@ -0,0 +1,156 @@
+"""
+限流与准入控制
+- RateLimiter: 按客户端 / 会话的令牌桶，限制每分钟请求数
+- AnswerAdmission: 限制同时进行的 Gemini 调用数和排队数，队列满时直接拒绝
+
+计数都只在当前进程内：多工作进程部署（SERVER_WORKERS > 1）时每个进程各自计数，
+实际的整体上限约为配置值 × 进程数
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Tuple
+
+
+class TokenBucket:
+    """令牌桶：以 rate 个/秒的速度补充，最多 capacity 个"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def try_acquire(self) -> Tuple[bool, float]:
+        """
+        取一个令牌
+
+        Returns:
+            (是否成功, 失败时距离下一个令牌的秒数)
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True, 0.0
+        return False, (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """按 key 限流，每个 key 一个令牌桶；桶的数量有上限，按最近使用淘汰（令牌桶只在当前进程内）"""
+
+    def __init__(self, max_per_minute: int, burst: int = 0, max_keys: int = 10000):
+        """
+        Args:
+            max_per_minute: 每分钟允许的请求数
+            burst: 允许的突发请求数，默认等于 max_per_minute
+        """
+        self.rate = max_per_minute / 60.0
+        self.capacity = burst or max_per_minute
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._allowed = 0
+        self._rejected = 0
+
+    def check(self, key: str) -> Tuple[bool, int]:
+        """
+        检查并消耗一次请求额度
+
+        Returns:
+            (是否允许, 被拒绝时建议的 Retry-After 秒数)
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.capacity)
+                self._buckets[key] = bucket
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            self._buckets.move_to_end(key)
+
+            allowed, wait = bucket.try_acquire()
+            if allowed:
+                self._allowed += 1
+                return True, 0
+            self._rejected += 1
+            return False, max(1, math.ceil(wait))
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                'clients': len(self._buckets),
+                'allowed': self._allowed,
+                'rejected': self._rejected
+            }
+
+
+class AnswerAdmission:
+    """
+    回答生成的准入控制
+
+    提交任务前调用 try_admit 占一个名额（运行中 + 排队中不超过 max_concurrent + max_queue），
+    实际调用 Gemini 时进入 slot（同时最多 max_concurrent 个，其余排队等待），
+    任务结束后调用 release 归还名额
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self._cond = threading.Condition()
+        self._admitted = 0
+        self._running = 0
+        self._rejected = 0
+        self._avg_seconds = 5.0  # 单次调用耗时的滑动平均，用于估算 Retry-After
+
+    def try_admit(self) -> bool:
+        with self._cond:
+            if self._admitted >= self.max_concurrent + self.max_queue:
+                self._rejected += 1
+                return False
+            self._admitted += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self._admitted = max(0, self._admitted - 1)
+
+    @contextmanager
+    def slot(self):
+        """占用一个并发调用名额，没有空闲名额时等待"""
+        with self._cond:
+            while self._running >= self.max_concurrent:
+                self._cond.wait()
+            self._running += 1
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            with self._cond:
+                self._running -= 1
+                self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * elapsed
+                self._cond.notify()
+
+    def retry_after(self) -> int:
+        """按当前排队长度和平均耗时估算多久后可以重试（秒）"""
+        with self._cond:
+            waves = (self._admitted - self.max_concurrent + 1) / self.max_concurrent
+            return max(1, math.ceil(self._avg_seconds * max(waves, 1)))
+
+    def get_stats(self) -> dict:
+        with self._cond:
+            return {
+                'running': self._running,
+                'queued': max(0, self._admitted - self._running),
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'rejected': self._rejected,
+                'avg_seconds': round(self._avg_seconds, 3)
+            }
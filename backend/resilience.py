@@ -0,0 +1,248 @@
+"""
+外部调用的容错层
+- 调用截止时间：整次调用（含重试）超过预算即放弃
+- 可重试错误按指数退避 + 随机抖动重试
+- 熔断器：连续失败达到阈值后快速失败，冷却后放行一个探测请求
+- 对冲请求：单次请求超过历史 p95 延迟仍未返回时，再发一个相同的请求，取先返回的结果
+"""
+
+import math
+import random
+import threading
+import time
+import logging
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# 熔断器状态
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，请求被快速拒绝"""
+    pass
+
+
+class CircuitBreaker:
+    """熔断器"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == STATE_OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = STATE_HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        """是否放行请求；半开状态只放行一个探测请求"""
+        with self._lock:
+            state = self._current_state()
+            if state == STATE_CLOSED:
+                return True
+            if state == STATE_HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = STATE_CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == STATE_HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != STATE_OPEN:
+                    logger.warning(f"连续失败 {self._failures} 次，熔断 {self.reset_timeout:.0f} 秒")
+                self._state = STATE_OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def record_ignored(self):
+        """调用结束但不说明服务是否健康（如参数错误）：不改变状态和失败计数，只释放半开探测名额"""
+        with self._lock:
+            self._probing = False
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'consecutive_failures': self._failures,
+                'rejected': self._rejected
+            }
+
+
+class LatencyTracker:
+    """最近若干次成功调用的延迟，用于计算对冲阈值"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """第 p 百分位延迟，样本不足时返回 None"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """第 attempt 次重试前的等待时间（指数退避 + 全随机抖动）"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+class ResilientCaller:
+    """带截止时间、重试、熔断和对冲的调用器"""
+
+    def __init__(self, timeout: float = 30.0, max_retries: int = 2, base_delay: float = 0.5,
+                 max_delay: float = 8.0, breaker: Optional[CircuitBreaker] = None,
+                 hedge_percentile: Optional[float] = None, hedge_min_samples: int = 20,
+                 is_retryable: Callable[[Exception], bool] = lambda e: isinstance(e, (TimeoutError, ConnectionError)),
+                 max_workers: int = 16):
+        """
+        Args:
+            timeout: 每次 call 的总时间预算（秒，含重试和退避等待），0 为不限制
+            max_retries: 可重试错误的最大重试次数
+            hedge_percentile: 对冲阈值使用的延迟百分位（例如 95），None 为不对冲
+            is_retryable: 判断异常是否可重试；超时总是可重试
+        """
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.hedge_percentile = hedge_percentile
+        self.latency = LatencyTracker(min_samples=hedge_min_samples)
+        self.is_retryable = is_retryable
+        # 超时被放弃的请求仍会占用线程直到返回，线程数要留有余量
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='resilient-call')
+
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'failures': 0, 'retries': 0, 'timeouts': 0, 'hedges': 0, 'hedge_wins': 0}
+
+    def call(self, func: Callable[[], T], hedge: bool = True) -> T:
+        """
+        执行调用
+
+        Args:
+            hedge: 是否允许对冲并记录延迟样本；不可重复执行或延迟口径不同的调用（如流式）应关闭
+
+        Raises:
+            CircuitOpenError: 熔断器打开
+            TimeoutError: 超过时间预算
+            Exception: 不可重试的错误或重试耗尽后的最后一个错误
+        """
+        self._count('calls')
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                self._count('failures')
+                raise CircuitOpenError("服务暂时不可用（熔断中），请稍后重试")
+
+            remaining = deadline - time.monotonic() if deadline else None
+            if remaining is not None and remaining <= 0:
+                self._count('failures')
+                raise TimeoutError(f"调用超时（{self.timeout:.0f} 秒）")
+
+            try:
+                result = self._attempt(func, remaining, hedge)
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                retryable = isinstance(e, TimeoutError) or self.is_retryable(e)
+                if retryable:
+                    # 只有服务端 / 网络问题计入熔断，参数错误等既不计入失败也不重置计数
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_ignored()
+
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                out_of_time = deadline is not None and time.monotonic() + delay >= deadline
+                if not retryable or attempt >= self.max_retries or out_of_time:
+                    self._count('failures')
+                    raise
+
+                attempt += 1
+                self._count('retries')
+                logger.warning(f"调用失败，{delay:.2f} 秒后第 {attempt} 次重试：{str(e)}")
+                time.sleep(delay)
+
+    def _attempt(self, func: Callable[[], T], timeout: Optional[float], hedge: bool) -> T:
+        """单次尝试；超过延迟百分位仍未返回时发出对冲请求"""
+        started = time.monotonic()
+        futures = [self.executor.submit(func)]
+
+        hedge_after = self.latency.percentile(self.hedge_percentile) if hedge and self.hedge_percentile else None
+        if hedge_after is not None and (timeout is None or hedge_after < timeout):
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done:
+                self._count('hedges')
+                futures.append(self.executor.submit(func))
+
+        pending = set(futures)
+        error: Optional[Exception] = None
+        while pending:
+            remaining = timeout - (time.monotonic() - started) if timeout is not None else None
+            if remaining is not None and remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if hedge:
+                        self.latency.add(time.monotonic() - started)
+                    if len(futures) > 1 and future is futures[1]:
+                        self._count('hedge_wins')
+                    return future.result()
+                error = future.exception()
+
+        if pending:
+            self._count('timeouts')
+            raise TimeoutError(f"调用超时（{timeout:.1f} 秒）")
+        raise error
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats['breaker'] = self.breaker.get_stats()
+        stats['hedge_threshold'] = (
+            self.latency.percentile(self.hedge_percentile) if self.hedge_percentile else None
+        )
+        return stats
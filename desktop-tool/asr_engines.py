@@ -0,0 +1,284 @@
+"""
+本地 Whisper 推理引擎
+- pytorch: openai-whisper（原有实现）
+- ctranslate2: faster-whisper，CPU 上支持 int8 量化，速度快数倍
+- onnx: ONNX Runtime（通过 optimum 导出/加载）
+
+所有引擎输出相同的结果格式：{'text': str, 'language': str, 'segments': [{'start', 'end', 'text'}]}
+"""
+
+import wave
+import logging
+import importlib.util
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 内存音频（16kHz float32）或音频文件路径
+EngineInput = Union[np.ndarray, str]
+
+SUPPORTED_ENGINES = ('pytorch', 'ctranslate2', 'onnx')
+
+# 各引擎依赖的模块及安装命令
+_ENGINE_REQUIREMENTS = {
+    'pytorch': ('whisper', 'pip install openai-whisper'),
+    'ctranslate2': ('faster_whisper', 'pip install faster-whisper'),
+    'onnx': ('optimum', 'pip install optimum[onnxruntime] transformers')
+}
+
+
+def check_engine_installed(engine: str):
+    """检查推理引擎依赖是否已安装，未安装时抛出 ImportError（不导入模块、不加载模型）"""
+    module, install_command = _ENGINE_REQUIREMENTS[engine]
+    if importlib.util.find_spec(module) is None:
+        logger.error(f"推理引擎 {engine} 依赖未安装，请运行: {install_command}")
+        raise ImportError(f"No module named '{module}'")
+
+
+def whisper_model_key(engine: str) -> Tuple[str, str, str]:
+    """
+    模型注册表的键 (引擎:模型名, 设备, 计算类型)
+
+    pytorch 引擎只区分 float16 / float32，配置了其他计算类型（如 ctranslate2 的 int8）时按 float32 处理，
+    同一个模型在各处得到相同的键，共享同一个实例
+    """
+    compute_type = Config.WHISPER_COMPUTE_TYPE
+    if engine == 'pytorch' and compute_type != 'float16':
+        compute_type = 'float32'
+    return f"{engine}:{Config.WHISPER_MODEL}", Config.WHISPER_DEVICE, compute_type
+
+
+def read_wav_file(path: str) -> np.ndarray:
+    """读取 16-bit PCM WAV 文件为单声道 float32 数组（不做重采样）"""
+    with wave.open(path, 'rb') as wf:
+        channels = wf.getnchannels()
+        audio = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    return audio.astype(np.float32) / 32768.0
+
+
+class WhisperEngine(ABC):
+    """Whisper 推理引擎基类"""
+
+    name = ''
+
+    def __init__(self, model_name: str, device: str, compute_type: str):
+        self.model_name = model_name
+        self.device = device
+        self.compute_type = compute_type
+
+    @abstractmethod
+    def transcribe(self, audio: EngineInput, language: Optional[str] = None) -> dict:
+        """转录 16kHz 单声道 float32 音频或音频文件"""
+        pass
+
+    def transcribe_batch(self, audios: List[np.ndarray], language: Optional[str] = None) -> List[dict]:
+        """批量转录，结果与输入顺序一致；默认逐段转录，支持批量推理的引擎覆盖此方法"""
+        return [self.transcribe(audio, language) for audio in audios]
+
+    def parameters(self):
+        """供模型注册表统计内存占用；非 PyTorch 引擎无法统计时返回空"""
+        return []
+
+    def buffers(self):
+        return []
+
+
+class PyTorchWhisperEngine(WhisperEngine):
+    """openai-whisper（PyTorch）"""
+
+    name = 'pytorch'
+
+    def __init__(self, model_name: str, device: str, compute_type: str):
+        super().__init__(model_name, device, compute_type)
+        import whisper
+        self.model = whisper.load_model(model_name, device=device)
+
+    def transcribe(self, audio: EngineInput, language: Optional[str] = None) -> dict:
+        result = self.model.transcribe(
+            audio,
+            language=language,
+            fp16=self.compute_type == 'float16',
+            beam_size=Config.WHISPER_BEAM_SIZE if Config.WHISPER_BEAM_SIZE > 1 else None
+        )
+        return {
+            'text': result.get('text', ''),
+            'language': result.get('language', language),
+            'segments': [
+                {'start': seg['start'], 'end': seg['end'], 'text': seg['text']}
+                for seg in result.get('segments', [])
+            ]
+        }
+
+    def transcribe_batch(self, audios: List[np.ndarray], language: Optional[str] = None) -> List[dict]:
+        """
+        批量推理：每段补齐到 30 秒窗口后堆叠成一个批次，编码器和解码器各跑一次
+
+        超过 30 秒的片段无法放入单个窗口，单独走 transcribe
+        """
+        import torch
+        import whisper
+
+        results: List[Optional[dict]] = [None] * len(audios)
+        window = whisper.audio.N_SAMPLES
+        batch_indices = [i for i, audio in enumerate(audios) if len(audio) <= window]
+
+        for i in range(len(audios)):
+            if i not in batch_indices:
+                results[i] = self.transcribe(audios[i], language)
+
+        if batch_indices:
+            mels = torch.stack([
+                whisper.log_mel_spectrogram(
+                    whisper.pad_or_trim(torch.from_numpy(audios[i])),
+                    n_mels=self.model.dims.n_mels
+                )
+                for i in batch_indices
+            ]).to(self.model.device)
+            options = whisper.DecodingOptions(
+                language=language,
+                fp16=self.compute_type == 'float16',
+                without_timestamps=True,
+                beam_size=Config.WHISPER_BEAM_SIZE if Config.WHISPER_BEAM_SIZE > 1 else None
+            )
+            decoded = self.model.decode(mels, options)
+
+            for i, result in zip(batch_indices, decoded):
+                duration = len(audios[i]) / 16000.0
+                results[i] = {
+                    'text': result.text,
+                    'language': result.language,
+                    'segments': [{'start': 0.0, 'end': duration, 'text': result.text}]
+                }
+
+        return results
+
+    def parameters(self):
+        return self.model.parameters()
+
+    def buffers(self):
+        return self.model.buffers()
+
+
+class CTranslate2WhisperEngine(WhisperEngine):
+    """faster-whisper（CTranslate2），推荐在 CPU 上配合 int8 使用"""
+
+    name = 'ctranslate2'
+
+    def __init__(self, model_name: str, device: str, compute_type: str):
+        super().__init__(model_name, device, compute_type)
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            logger.error("未安装 faster-whisper，请运行: pip install faster-whisper")
+            raise
+
+        self.model = WhisperModel(
+            model_name,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=Config.WHISPER_CPU_THREADS
+        )
+
+    def transcribe(self, audio: EngineInput, language: Optional[str] = None) -> dict:
+        segments, info = self.model.transcribe(
+            audio,
+            language=language,
+            beam_size=Config.WHISPER_BEAM_SIZE,
+            vad_filter=False  # 录音端已做 VAD
+        )
+        # segments 是惰性生成器，遍历时才真正解码
+        segments = [{'start': seg.start, 'end': seg.end, 'text': seg.text} for seg in segments]
+        return {
+            'text': ''.join(seg['text'] for seg in segments),
+            'language': info.language,
+            'segments': segments
+        }
+
+
+class ONNXWhisperEngine(WhisperEngine):
+    """ONNX Runtime（通过 optimum 加载 Hugging Face 格式的 Whisper）"""
+
+    name = 'onnx'
+
+    def __init__(self, model_name: str, device: str, compute_type: str):
+        super().__init__(model_name, device, compute_type)
+        try:
+            from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+            from transformers import WhisperProcessor
+        except ImportError:
+            logger.error("未安装 ONNX Runtime 依赖，请运行: pip install optimum[onnxruntime] transformers")
+            raise
+
+        model_id = model_name if '/' in model_name else f"openai/whisper-{model_name}"
+        self.processor = WhisperProcessor.from_pretrained(model_id)
+        self.model = ORTModelForSpeechSeq2Seq.from_pretrained(
+            model_id,
+            export=True,
+            provider='CUDAExecutionProvider' if device == 'cuda' else 'CPUExecutionProvider'
+        )
+
+    def transcribe(self, audio: EngineInput, language: Optional[str] = None) -> dict:
+        if isinstance(audio, str):
+            audio = read_wav_file(audio)
+
+        features = self.processor(audio, sampling_rate=16000, return_tensors='pt').input_features
+        generated = self.model.generate(
+            features,
+            language=language,
+            task='transcribe',
+            num_beams=Config.WHISPER_BEAM_SIZE
+        )
+        text = self.processor.batch_decode(generated, skip_special_tokens=True)[0]
+        duration = len(audio) / 16000.0
+        return {
+            'text': text,
+            'language': language,
+            'segments': [{'start': 0.0, 'end': duration, 'text': text}]
+        }
+
+    def transcribe_batch(self, audios: List[np.ndarray], language: Optional[str] = None) -> List[dict]:
+        """批量推理：特征提取时统一补齐到 30 秒，generate 一次处理整个批次"""
+        features = self.processor(list(audios), sampling_rate=16000, return_tensors='pt').input_features
+        generated = self.model.generate(
+            features,
+            language=language,
+            task='transcribe',
+            num_beams=Config.WHISPER_BEAM_SIZE
+        )
+        texts = self.processor.batch_decode(generated, skip_special_tokens=True)
+        return [
+            {
+                'text': text,
+                'language': language,
+                'segments': [{'start': 0.0, 'end': len(audio) / 16000.0, 'text': text}]
+            }
+            for audio, text in zip(audios, texts)
+        ]
+
+
+_ENGINE_CLASSES = {
+    'pytorch': PyTorchWhisperEngine,
+    'ctranslate2': CTranslate2WhisperEngine,
+    'onnx': ONNXWhisperEngine
+}
+
+
+def load_whisper_engine(registry_name: str, device: str, compute_type: str) -> WhisperEngine:
+    """
+    模型注册表加载函数
+
+    Args:
+        registry_name: "引擎:模型名"，例如 "ctranslate2:small"
+    """
+    engine, _, model_name = registry_name.partition(':')
+    engine_class = _ENGINE_CLASSES.get(engine)
+    if engine_class is None:
+        raise ValueError(f"不支持的 Whisper 推理引擎：{engine}，可选：{', '.join(SUPPORTED_ENGINES)}")
+    return engine_class(model_name, device, compute_type)
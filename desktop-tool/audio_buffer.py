@@ -0,0 +1,75 @@
+"""
+预分配的录音环形缓冲区
+录音期间内存占用固定为 O(预录 + 最长片段)，片段结束时只做一次切片复制
+"""
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """
+    int16 环形缓冲区
+
+    使用绝对样本位置寻址：write 返回写入块的起始位置，
+    read 按 [start, end) 取出仍在缓冲区内的数据
+    """
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("缓冲区容量必须大于 0")
+
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.int16)
+        self._end = 0  # 已写入的样本总数（绝对位置）
+
+    @property
+    def end(self) -> int:
+        """下一次写入的绝对位置"""
+        return self._end
+
+    @property
+    def start(self) -> int:
+        """缓冲区中最早可读的绝对位置"""
+        return max(0, self._end - self.capacity)
+
+    def write(self, samples: np.ndarray) -> int:
+        """
+        写入一块样本，超出容量的旧数据被覆盖
+
+        Returns:
+            int: 该块的绝对起始位置
+        """
+        position = self._end
+        samples = samples.reshape(-1)
+        n = len(samples)
+        if n >= self.capacity:
+            samples = samples[-self.capacity:]
+            offset = (position + n - self.capacity) % self.capacity
+            n_written = self.capacity
+        else:
+            offset = position % self.capacity
+            n_written = n
+
+        first = min(n_written, self.capacity - offset)
+        self._data[offset:offset + first] = samples[:first]
+        if first < n_written:
+            self._data[:n_written - first] = samples[first:]
+
+        self._end += n
+        return position
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """取出 [start, end) 区间的样本副本，早于缓冲区起点的部分会被截掉"""
+        start = max(start, self.start)
+        end = min(end, self._end)
+        if end <= start:
+            return np.zeros(0, dtype=np.int16)
+
+        a = start % self.capacity
+        b = a + (end - start)
+        if b <= self.capacity:
+            return self._data[a:b].copy()
+        return np.concatenate((self._data[a:], self._data[:b - self.capacity]))
+
+    def clear(self):
+        self._end = 0
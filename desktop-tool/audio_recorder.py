@@ -3,21 +3,30 @@ import wave
 import threading
 import time
 import numpy as np
-from typing import Callable, Optional
+from typing import Callable, List, Optional
 import logging
 from config import Config
+from segment_queue import AudioSegment, SegmentQueue, TranscriptionWorkerPool
+from vad import EVENT_SPEECH, EVENT_SPEECH_END, EVENT_SPEECH_START, VADSegmenter, create_vad
 
 logger = logging.getLogger(__name__)
 
 class AudioRecorder:
-    def __init__(self, on_audio_ready: Callable[[str], None]):
+    def __init__(self, on_audio_ready: Callable[[np.ndarray], None], stream_listener=None,
+                 on_audio_batch_ready: Optional[Callable[[List[np.ndarray]], None]] = None):
         """
         音频录制器
         
         Args:
-            on_audio_ready: 当音频文件准备好时的回调函数，参数为音频文件路径
+            on_audio_ready: 当一段音频准备好时的回调函数，参数为 int16 PCM 数组
+            stream_listener: 可选的流式转录器（StreamingTranscriber），设置后音频块实时送入，
+                片段结束时由它做最终解码，不再进入转录队列
+            on_audio_batch_ready: 可选的批量回调，TRANSCRIPTION_BATCH_SIZE > 1 时
+                队列中积压的多段音频按顺序一次性传入
         """
         self.on_audio_ready = on_audio_ready
+        self.on_audio_batch_ready = on_audio_batch_ready
+        self.stream_listener = stream_listener
         self.is_recording = False
         self.audio_thread: Optional[threading.Thread] = None
         
@@ -32,6 +41,35 @@ class AudioRecorder:
         self.silence_duration = Config.SILENCE_DURATION
         self.min_recording_duration = Config.MIN_RECORDING_DURATION
         
+        # 语音活动检测与分段
+        self.vad = create_vad(self.sample_rate, self.channels)
+        self.segmenter = VADSegmenter(
+            self.vad,
+            chunk_duration=self.chunk_size / float(self.sample_rate),
+            silence_duration=self.silence_duration,
+            pre_roll=Config.VAD_PRE_ROLL_MS / 1000.0,
+            hangover=Config.VAD_HANGOVER_MS / 1000.0,
+            min_speech=Config.VAD_MIN_SPEECH_MS / 1000.0,
+            max_segment=Config.MAX_SEGMENT_DURATION
+        )
+        logger.info(f"VAD 引擎：{type(self.vad).__name__}")
+        
+        # 录音线程只负责入队，转录交给工作线程池
+        self.segment_queue = SegmentQueue(
+            maxsize=Config.SEGMENT_QUEUE_SIZE,
+            policy=Config.SEGMENT_QUEUE_POLICY,
+            block_timeout=Config.SEGMENT_QUEUE_BLOCK_TIMEOUT
+        )
+        self.worker_pool = TranscriptionWorkerPool(
+            self.segment_queue,
+            self._process_segment,
+            num_workers=Config.TRANSCRIPTION_WORKERS,
+            batch_handler=self._process_segment_batch if on_audio_batch_ready else None,
+            max_batch_size=Config.TRANSCRIPTION_BATCH_SIZE,
+            max_batch_wait=Config.TRANSCRIPTION_BATCH_WAIT
+        )
+        self._segment_seq = 0
+        
         # 初始化 PyAudio
         self.audio = pyaudio.PyAudio()
         
@@ -72,6 +110,7 @@ class AudioRecorder:
             return
         
         self.is_recording = True
+        self.worker_pool.start()
         self.audio_thread = threading.Thread(target=self._record_audio)
         self.audio_thread.daemon = True
         self.audio_thread.start()
@@ -85,7 +124,8 @@ class AudioRecorder:
         self.is_recording = False
         if self.audio_thread:
             self.audio_thread.join(timeout=5.0)
-        logger.info("停止录音")
+        self.worker_pool.stop()
+        logger.info(f"停止录音，转录队列指标：{self.get_queue_metrics()}")
     
     def _record_audio(self):
         """录音主循环"""
@@ -99,48 +139,32 @@ class AudioRecorder:
                 frames_per_buffer=self.chunk_size
             )
             
-            frames = []
-            silence_start = None
-            recording_start = time.time()
-            
             logger.info("录音流已启动，等待语音...")
             
             while self.is_recording:
                 try:
                     data = stream.read(self.chunk_size, exception_on_overflow=False)
-                    frames.append(data)
-                    
-                    # 计算音频强度
                     audio_data = np.frombuffer(data, dtype=np.int16)
-                    volume = np.sqrt(np.mean(audio_data**2))
-                    normalized_volume = volume / 32768.0  # 归一化到 0-1
                     
-                    # 静音检测
-                    if normalized_volume < self.silence_threshold:
-                        if silence_start is None:
-                            silence_start = time.time()
-                        elif time.time() - silence_start > self.silence_duration:
-                            # 检测到足够长的静音，结束当前录音
-                            recording_duration = time.time() - recording_start
-                            if recording_duration >= self.min_recording_duration and len(frames) > 0:
-                                self._save_and_process_audio(frames)
-                            
-                            # 重置状态，准备下一段录音
-                            frames = []
-                            silence_start = None
-                            recording_start = time.time()
-                    else:
-                        silence_start = None
+                    # 语音活动检测与分段（音频写入预分配的环形缓冲区）
+                    event, audio = self.segmenter.process(audio_data)
+                    
+                    if event == EVENT_SPEECH_START:
+                        logger.debug("检测到语音开始")
+                        self._feed_stream_listener(audio)
+                    elif event == EVENT_SPEECH:
+                        self._feed_stream_listener(audio)
+                    elif event == EVENT_SPEECH_END:
+                        self._close_segment(audio, self.segmenter.speech_duration(audio))
                     
                 except Exception as e:
                     logger.error(f"录音过程中出错：{str(e)}")
                     break
             
             # 处理最后一段音频
-            if len(frames) > 0:
-                recording_duration = time.time() - recording_start
-                if recording_duration >= self.min_recording_duration:
-                    self._save_and_process_audio(frames)
+            audio = self.segmenter.flush()
+            if len(audio) > 0:
+                self._close_segment(audio, self.segmenter.speech_duration(audio))
         
         except Exception as e:
             logger.error(f"录音失败：{str(e)}")
@@ -150,24 +174,79 @@ class AudioRecorder:
                 stream.stop_stream()
                 stream.close()
     
-    def _save_and_process_audio(self, frames):
-        """保存音频文件并触发处理"""
+    def _feed_stream_listener(self, audio: np.ndarray):
+        """把音频实时送入流式转录器"""
+        if self.stream_listener:
+            self.stream_listener.feed(audio.reshape(-1, self.channels) if self.channels > 1 else audio)
+    
+    def _close_segment(self, audio: np.ndarray, recording_duration: float):
+        """结束一段录音：时长足够则交给流式转录器或转录队列，否则丢弃"""
+        keep = recording_duration >= self.min_recording_duration and len(audio) > 0
+        
+        if self.stream_listener:
+            if keep:
+                self.stream_listener.end_segment()
+            else:
+                self.stream_listener.discard_segment()
+        elif keep:
+            self._enqueue_segment(audio)
+    
+    def _enqueue_segment(self, audio: np.ndarray):
+        """把一段录音放入转录队列（在录音线程中调用，不做任何耗时操作）"""
+        self._segment_seq += 1
+        segment = AudioSegment(
+            audio=audio,
+            sample_rate=self.sample_rate,
+            channels=self.channels,
+            seq=self._segment_seq
+        )
+        self.segment_queue.put(segment)
+        logger.debug(f"音频片段 #{segment.seq} 已入队，队列深度：{len(self.segment_queue)}")
+    
+    def get_queue_metrics(self) -> dict:
+        """获取转录队列指标"""
+        metrics = self.segment_queue.get_metrics()
+        if self.worker_pool.batching:
+            metrics.update(self.worker_pool.get_metrics())
+        return metrics
+    
+    def _process_segment(self, segment: AudioSegment):
+        """把内存中的音频片段交给回调处理（在转录工作线程中调用）"""
+        try:
+            if Config.SAVE_AUDIO_FILES:
+                self._save_debug_audio(segment)
+            
+            # 直接传递 int16 数组，不再写临时文件
+            self.on_audio_ready(segment.samples())
+            
+        except Exception as e:
+            logger.error(f"处理音频片段失败：{str(e)}")
+    
+    def _process_segment_batch(self, segments: List[AudioSegment]):
+        """把一批音频片段交给批量回调处理（在转录工作线程中调用）"""
+        try:
+            if Config.SAVE_AUDIO_FILES:
+                for segment in segments:
+                    self._save_debug_audio(segment)
+            
+            self.on_audio_batch_ready([segment.samples() for segment in segments])
+            
+        except Exception as e:
+            logger.error(f"批量处理音频片段失败：{str(e)}")
+    
+    def _save_debug_audio(self, segment: AudioSegment):
+        """调试模式下把音频片段另存为 WAV 文件"""
         try:
-            # 生成临时文件名
             timestamp = int(time.time() * 1000)
-            audio_file = f"temp_audio_{timestamp}.wav"
+            audio_file = f"temp_audio_{timestamp}_{segment.seq}.wav"
             
-            # 保存音频文件
             with wave.open(audio_file, 'wb') as wf:
-                wf.setnchannels(self.channels)
-                wf.setsampwidth(self.audio.get_sample_size(self.format))
-                wf.setframerate(self.sample_rate)
-                wf.writeframes(b''.join(frames))
-            
-            logger.info(f"音频文件已保存：{audio_file}")
+                wf.setnchannels(segment.channels)
+                wf.setsampwidth(segment.sample_width)
+                wf.setframerate(segment.sample_rate)
+                wf.writeframes(segment.pcm)
             
-            # 触发回调
-            self.on_audio_ready(audio_file)
+            logger.info(f"调试音频文件已保存：{audio_file}")
             
         except Exception as e:
             logger.error(f"保存音频文件失败：{str(e)}")
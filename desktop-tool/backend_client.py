@@ -0,0 +1,225 @@
+"""
+后端通信客户端
+- HTTP：复用同一个 requests.Session，保持长连接，避免每句话都重新建立 TCP 连接
+- Socket.IO（可选，BACKEND_TRANSPORT=socketio）：通过常驻的 websocket 连接提交问题，
+  每个问题只需要一帧；连接不可用时自动回退到 HTTP
+"""
+
+import logging
+import time
+from typing import List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class BackendError(Exception):
+    """无法连接后端或请求超时"""
+    pass
+
+
+class BackendClient:
+    """后端通信客户端"""
+
+    # Socket.IO 首次连接失败后的重试间隔（秒）；连上之后的断线重连由 python-socketio 负责
+    SOCKET_RETRY_INTERVAL = 30
+
+    def __init__(self, base_url: str, session_id: str, transport: str = 'http',
+                 pool_size: int = 4, timeout: float = 10):
+        self.base_url = base_url.rstrip('/')
+        self.session_id = session_id
+        self.transport = transport
+        self.timeout = timeout
+
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.http.mount('http://', adapter)
+        self.http.mount('https://', adapter)
+        self.http.headers.update({'Content-Type': 'application/json'})
+
+        self._socket = None
+        self._last_connect_attempt = 0.0
+        self._batch_supported = True
+        if transport == 'socketio':
+            self._connect_socket()
+
+    def _connect_socket(self):
+        """建立 Socket.IO 长连接，失败时只记录日志（之后走 HTTP，并定期重试连接）"""
+        self._last_connect_attempt = time.monotonic()
+        try:
+            import socketio
+        except ImportError:
+            logger.error("未安装 python-socketio，请运行: pip install \"python-socketio[client]\"，已回退到 HTTP")
+            return
+
+        client = socketio.Client(reconnection=True, logger=False, engineio_logger=False)
+        try:
+            client.connect(
+                self.base_url,
+                auth={'session_id': self.session_id},
+                transports=['websocket'],
+                wait_timeout=self.timeout
+            )
+            self._socket = client
+            logger.info("已建立到后端的 Socket.IO 长连接")
+        except Exception as e:
+            logger.warning(f"Socket.IO 连接失败，使用 HTTP：{str(e)}")
+
+    @property
+    def socket_connected(self) -> bool:
+        """Socket.IO 连接是否可用；从未连上时每隔 SOCKET_RETRY_INTERVAL 秒重试一次"""
+        if self.transport != 'socketio':
+            return False
+        if self._socket is None and time.monotonic() - self._last_connect_attempt >= self.SOCKET_RETRY_INTERVAL:
+            self._connect_socket()
+        return bool(self._socket and self._socket.connected)
+
+    def submit_question(self, payload: dict, timeout: Optional[float] = None) -> Tuple[int, dict]:
+        """
+        提交问题（参数与 POST /api/question 相同，payload 中没有 session_id 时使用当前会话）
+
+        Returns:
+            (状态码, 响应内容)；429 时响应内容中有 retry_after
+
+        Raises:
+            BackendError: 无法连接后端或超时
+        """
+        payload = dict(payload, session_id=payload.get('session_id') or self.session_id)
+        timeout = timeout or self.timeout
+
+        if self.socket_connected:
+            try:
+                ack = self._socket.call('submit_question', payload, timeout=timeout)
+                ack = ack or {}
+                return ack.pop('status_code', 500), ack
+            except Exception as e:
+                logger.warning(f"Socket.IO 提交失败，改用 HTTP：{str(e)}")
+
+        # 带 client_id 的问题超时重试时，后端按幂等键返回第一次的结果
+        headers = {'Idempotency-Key': payload['client_id']} if payload.get('client_id') else None
+        try:
+            response = self.http.post(f"{self.base_url}/api/question", json=payload, headers=headers, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            raise BackendError(str(e)) from e
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        if response.status_code == 429 and 'retry_after' not in body:
+            body['retry_after'] = int(response.headers.get('Retry-After', 1))
+        return response.status_code, body
+
+    def submit_questions(self, payloads: List[dict], timeout: Optional[float] = None) -> List[Tuple[int, dict]]:
+        """
+        批量提交问题（POST /api/questions/batch，一次请求、一次存储写入）；
+        后端不支持批量接口时逐个提交
+
+        整批使用同一个会话：payloads 中的 session_id 须相同（调用方按会话分批），没有时使用当前会话
+
+        Returns:
+            已处理的问题的 (状态码, 响应内容)，顺序与 payloads 对应；整批被限流时只有一项 429
+
+        Raises:
+            BackendError: 无法连接后端或超时
+        """
+        if not self._batch_supported:
+            return self._submit_one_by_one(payloads, timeout)
+
+        data = {'session_id': payloads[0].get('session_id') or self.session_id, 'questions': payloads}
+        timeout = timeout or self.timeout
+
+        status_code, body = None, {}
+        if self.socket_connected:
+            try:
+                body = self._socket.call('submit_questions', data, timeout=timeout) or {}
+                status_code = body.pop('status_code', 500)
+            except Exception as e:
+                logger.warning(f"Socket.IO 批量提交失败，改用 HTTP：{str(e)}")
+
+        if status_code is None:
+            try:
+                response = self.http.post(f"{self.base_url}/api/questions/batch", json=data, timeout=timeout)
+            except requests.exceptions.RequestException as e:
+                raise BackendError(str(e)) from e
+            try:
+                body = response.json()
+            except ValueError:
+                body = {}
+            status_code = response.status_code
+            if status_code == 429 and 'retry_after' not in body:
+                body['retry_after'] = int(response.headers.get('Retry-After', 1))
+
+        if status_code == 404:
+            logger.warning("后端不支持批量提交接口，改为逐个提交")
+            self._batch_supported = False
+            return self._submit_one_by_one(payloads, timeout)
+        if status_code == 413:
+            return self._submit_one_by_one(payloads, timeout)
+        if status_code != 200:
+            return [(status_code, body)]
+
+        results = []
+        for result in body.get('results', []):
+            result = dict(result)
+            results.append((result.pop('status_code', 500), result))
+        return results
+
+    def _submit_one_by_one(self, payloads: List[dict], timeout: Optional[float]) -> List[Tuple[int, dict]]:
+        """按顺序逐个提交；遇到重复请求处理中、限流或服务端错误时停止，后面的问题不再提交"""
+        results = []
+        for payload in payloads:
+            try:
+                status_code, body = self.submit_question(payload, timeout)
+            except BackendError:
+                if not results:
+                    raise
+                break
+            results.append((status_code, body))
+            if status_code in (409, 429) or status_code >= 500:
+                break
+        return results
+
+    def send_partial(self, payload: dict, timeout: float = 2):
+        """推送部分转录结果；只用于实时展示，不等待确认，失败时忽略"""
+        payload = dict(payload, session_id=self.session_id, partial=True)
+
+        if self.socket_connected:
+            try:
+                self._socket.emit('submit_question', payload)
+                return
+            except Exception as e:
+                logger.debug(f"部分结果推送失败：{str(e)}")
+
+        try:
+            response = self.http.post(f"{self.base_url}/api/question", json=payload, timeout=timeout)
+            if response.status_code != 200:
+                logger.debug(f"部分结果推送失败，状态码：{response.status_code}")
+        except requests.exceptions.RequestException as e:
+            logger.debug(f"部分结果推送失败：{str(e)}")
+
+    def health(self, timeout: float = 5) -> dict:
+        """
+        查询后端健康状态
+
+        Raises:
+            BackendError: 无法连接或响应异常
+        """
+        try:
+            response = self.http.get(f"{self.base_url}/health", timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            raise BackendError(str(e)) from e
+        if response.status_code != 200:
+            raise BackendError(f"后端服务器响应异常：{response.status_code}")
+        return response.json()
+
+    def close(self):
+        if self._socket:
+            try:
+                self._socket.disconnect()
+            except Exception:
+                pass
+            self._socket = None
+        self.http.close()
@@ -13,6 +13,18 @@ else:
 class Config:
     # 后端服务器配置
     BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:5001')
+    # 面试会话 ID，同一场面试的问题归到同一会话；留空则每次启动随机生成
+    SESSION_ID = os.getenv('SESSION_ID', '')
+    # 提交问题的通道：http（连接池复用长连接）或 socketio（常驻 websocket，需安装 python-socketio[client]）
+    BACKEND_TRANSPORT = os.getenv('BACKEND_TRANSPORT', 'http')
+    BACKEND_POOL_SIZE = int(os.getenv('BACKEND_POOL_SIZE', 4))
+    BACKEND_TIMEOUT = float(os.getenv('BACKEND_TIMEOUT', 10))  # 秒
+    # 本地发件箱：问题先写入本地 SQLite 再由后台线程发送，后端不可用时不丢失
+    OUTBOX_ENABLED = os.getenv('OUTBOX_ENABLED', 'True').lower() == 'true'
+    OUTBOX_PATH = os.getenv('OUTBOX_PATH', 'data/outbox.db')
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 20))  # 每批最多发送的问题数
+    OUTBOX_RETRY_BASE_DELAY = float(os.getenv('OUTBOX_RETRY_BASE_DELAY', 1.0))  # 重试退避基数（秒）
+    OUTBOX_RETRY_MAX_DELAY = float(os.getenv('OUTBOX_RETRY_MAX_DELAY', 60.0))  # 重试最长等待（秒）
     
     # 音频配置
     SAMPLE_RATE = int(os.getenv('SAMPLE_RATE', 16000))
@@ -20,10 +32,21 @@ class Config:
     CHANNELS = int(os.getenv('CHANNELS', 1))
     
     # 语音识别配置
-    SPEECH_PROVIDER = os.getenv('SPEECH_PROVIDER', 'local_whisper')  # local_whisper, openai, tencent, aliyun, baidu
+    SPEECH_PROVIDER = os.getenv('SPEECH_PROVIDER', 'local_whisper')  # local_whisper, faster_whisper, openai, tencent, aliyun, baidu
 
     # 本地 Whisper 配置
     WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'base')  # tiny, base, small, medium, large
+    WHISPER_ENGINE = os.getenv('WHISPER_ENGINE', 'pytorch')  # pytorch, ctranslate2, onnx
+    WHISPER_DEVICE = os.getenv('WHISPER_DEVICE', 'cpu')  # cpu, cuda
+    # pytorch: float32/float16；ctranslate2: int8/int8_float16/float16/float32
+    # 不设置时按实际使用的引擎选择（SPEECH_PROVIDER=faster_whisper 固定使用 ctranslate2）
+    WHISPER_COMPUTE_TYPE = os.getenv(
+        'WHISPER_COMPUTE_TYPE',
+        'int8' if SPEECH_PROVIDER.lower() == 'faster_whisper' or WHISPER_ENGINE.lower() == 'ctranslate2' else 'float32'
+    )
+    WHISPER_CPU_THREADS = int(os.getenv('WHISPER_CPU_THREADS', 0))  # ctranslate2 推理线程数，0 为自动
+    WHISPER_BEAM_SIZE = int(os.getenv('WHISPER_BEAM_SIZE', 1))  # 1 为贪心解码，速度最快
+    WHISPER_PRELOAD = os.getenv('WHISPER_PRELOAD', 'True').lower() == 'true'  # 启动时后台预热模型
 
     # OpenAI Whisper API 配置
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
@@ -53,6 +76,30 @@ class Config:
     SILENCE_THRESHOLD = float(os.getenv('SILENCE_THRESHOLD', 0.01))  # 静音阈值
     SILENCE_DURATION = float(os.getenv('SILENCE_DURATION', 2.0))     # 静音持续时间（秒）
     MIN_RECORDING_DURATION = float(os.getenv('MIN_RECORDING_DURATION', 1.0))  # 最小录音时长
+    MAX_SEGMENT_DURATION = float(os.getenv('MAX_SEGMENT_DURATION', 30.0))  # 单段最长时长（秒），超过后强制切分
+    
+    # 语音活动检测配置
+    VAD_ENGINE = os.getenv('VAD_ENGINE', 'energy')  # energy, spectral, webrtc, silero
+    VAD_NOISE_RATIO = float(os.getenv('VAD_NOISE_RATIO', 3.0))  # 能量超过噪声底的倍数才算语音
+    VAD_PRE_ROLL_MS = int(os.getenv('VAD_PRE_ROLL_MS', 300))  # 语音开始前保留的音频（毫秒）
+    VAD_HANGOVER_MS = int(os.getenv('VAD_HANGOVER_MS', 300))  # 语音结束后保留的尾部静音（毫秒）
+    VAD_MIN_SPEECH_MS = int(os.getenv('VAD_MIN_SPEECH_MS', 100))  # 连续语音达到该时长才开始片段（毫秒）
+    VAD_WEBRTC_AGGRESSIVENESS = int(os.getenv('VAD_WEBRTC_AGGRESSIVENESS', 2))  # 0-3，越大越严格
+    VAD_SPEECH_THRESHOLD = float(os.getenv('VAD_SPEECH_THRESHOLD', 0.5))  # Silero 语音概率阈值
+    
+    # 转录队列配置
+    TRANSCRIPTION_WORKERS = int(os.getenv('TRANSCRIPTION_WORKERS', 1))  # 转录工作线程数
+    SEGMENT_QUEUE_SIZE = int(os.getenv('SEGMENT_QUEUE_SIZE', 8))  # 待转录片段队列容量
+    SEGMENT_QUEUE_POLICY = os.getenv('SEGMENT_QUEUE_POLICY', 'drop_oldest')  # drop_oldest, block, coalesce
+    SEGMENT_QUEUE_BLOCK_TIMEOUT = float(os.getenv('SEGMENT_QUEUE_BLOCK_TIMEOUT', 1.0))  # block 策略最长等待（秒）
+    TRANSCRIPTION_BATCH_SIZE = int(os.getenv('TRANSCRIPTION_BATCH_SIZE', 1))  # 微批大小，1 为逐段转录
+    TRANSCRIPTION_BATCH_WAIT = float(os.getenv('TRANSCRIPTION_BATCH_WAIT', 0.2))  # 凑批最长等待（秒）
+    
+    # 流式转录配置（仅本地 Whisper）
+    STREAMING_MODE = os.getenv('STREAMING_MODE', 'False').lower() == 'true'
+    STREAMING_INTERVAL = float(os.getenv('STREAMING_INTERVAL', 0.5))  # 部分解码间隔（秒）
+    STREAMING_MAX_WINDOW = float(os.getenv('STREAMING_MAX_WINDOW', 30.0))  # 部分解码最长窗口（秒）
+    STREAMING_SEND_PARTIALS = os.getenv('STREAMING_SEND_PARTIALS', 'True').lower() == 'true'  # 是否把部分结果推送给后端
     
     # 环境配置
     ENVIRONMENT = os.getenv('ENVIRONMENT', 'development')
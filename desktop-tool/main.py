@@ -2,16 +2,20 @@ import logging
 import signal
 import sys
 import time
-import requests
 import json
-from typing import Optional
+from typing import List, Optional
 import threading
+import numpy as np
 from pynput import keyboard
 import platform
+import uuid
 
 from config import Config
 from audio_recorder import AudioRecorder
-from speech_client import SpeechRecognitionClient
+from backend_client import BackendClient, BackendError
+from outbox import Outbox, OutboxSender
+from speech_client import SpeechRecognitionClient, LocalWhisperProvider
+from streaming_transcriber import StreamingTranscriber
 
 # 配置日志
 logging.basicConfig(
@@ -26,9 +30,40 @@ class InterviewAssistant:
         self.is_running = False
         self.ai_mode_enabled = False  # 控制是否将文本传给 AI
         
+        # 面试会话 ID，后端按会话隔离对话记录和推送
+        self.session_id = Config.SESSION_ID or uuid.uuid4().hex[:12]
+        
+        # 后端通信（连接池复用 TCP 连接，可选 Socket.IO 长连接）
+        self.backend = BackendClient(
+            Config.BACKEND_URL,
+            self.session_id,
+            transport=Config.BACKEND_TRANSPORT,
+            pool_size=Config.BACKEND_POOL_SIZE,
+            timeout=Config.BACKEND_TIMEOUT
+        )
+        
+        # 本地发件箱：问题先落盘再由后台线程发送，后端不可用时不丢失
+        self.outbox: Optional[Outbox] = None
+        self.outbox_sender: Optional[OutboxSender] = None
+        if Config.OUTBOX_ENABLED:
+            self.outbox = Outbox(Config.OUTBOX_PATH)
+            self.outbox_sender = OutboxSender(
+                self.outbox,
+                self.backend.submit_questions,
+                batch_size=Config.OUTBOX_BATCH_SIZE,
+                base_delay=Config.OUTBOX_RETRY_BASE_DELAY,
+                max_delay=Config.OUTBOX_RETRY_MAX_DELAY,
+                on_result=lambda payload, status_code, result: self.log_submit_result(status_code, result)
+            )
+        
         # 初始化组件
         self.speech_client = SpeechRecognitionClient()
-        self.audio_recorder = AudioRecorder(self.on_audio_ready)
+        self.streaming_transcriber = self._create_streaming_transcriber()
+        self.audio_recorder = AudioRecorder(
+            self.on_audio_ready,
+            self.streaming_transcriber,
+            on_audio_batch_ready=self.on_audio_batch_ready if Config.TRANSCRIPTION_BATCH_SIZE > 1 else None
+        )
         
         # 快捷键监听器
         self.hotkey_listener: Optional[keyboard.GlobalHotKeys] = None
@@ -37,13 +72,44 @@ class InterviewAssistant:
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
     
-    def on_audio_ready(self, audio_file_path: str):
-        """当音频文件准备好时的回调"""
+    def _create_streaming_transcriber(self) -> Optional[StreamingTranscriber]:
+        """流式模式下创建流式转录器（仅支持本地 Whisper）"""
+        if not Config.STREAMING_MODE:
+            return None
+        
+        if not isinstance(self.speech_client.provider, LocalWhisperProvider):
+            logger.warning("流式转录仅支持本地 Whisper，已回退到整段转录")
+            return None
+        
+        # 每次运行使用独立前缀，避免后端把不同运行的片段混在一起
+        self.stream_prefix = uuid.uuid4().hex[:8]
+        return StreamingTranscriber(
+            self.speech_client.provider.transcribe,
+            Config.SAMPLE_RATE,
+            on_partial=self.on_partial_transcript,
+            on_final=self.on_final_transcript,
+            interval=Config.STREAMING_INTERVAL,
+            max_window=Config.STREAMING_MAX_WINDOW
+        )
+    
+    def on_partial_transcript(self, segment_id: int, committed: str, tentative: str):
+        """流式转录部分结果回调"""
+        logger.info(f"部分转录：{committed}|{tentative}")
+        if Config.STREAMING_SEND_PARTIALS:
+            self.send_partial_to_backend(f"{self.stream_prefix}-{segment_id}", committed, tentative)
+    
+    def on_final_transcript(self, segment_id: int, text: str):
+        """流式转录最终结果回调"""
+        logger.info(f"转录结果：{text}")
+        self.send_to_backend(text, self.ai_mode_enabled, stream_id=f"{self.stream_prefix}-{segment_id}")
+    
+    def on_audio_ready(self, audio: np.ndarray):
+        """当一段音频准备好时的回调"""
         try:
-            logger.info(f"处理音频文件：{audio_file_path}")
+            logger.info(f"处理音频片段：{len(audio) / Config.SAMPLE_RATE:.1f} 秒")
             
             # 转录音频
-            text = self.speech_client.transcribe_audio(audio_file_path)
+            text = self.speech_client.transcribe_audio(audio, Config.SAMPLE_RATE)
             
             if text:
                 logger.info(f"转录结果：{text}")
@@ -56,36 +122,72 @@ class InterviewAssistant:
         except Exception as e:
             logger.error(f"处理音频时出错：{str(e)}")
     
-    def send_to_backend(self, question: str, generate_answer: bool = True):
-        """发送问题到后端服务器"""
+    def on_audio_batch_ready(self, audios: List[np.ndarray]):
+        """多段音频积压时的批量回调，按录音顺序发送转录结果"""
         try:
-            url = f"{Config.BACKEND_URL}/api/question"
-            data = {
-                "question": question,
-                "generate_answer": generate_answer
-            }
+            logger.info(f"批量处理 {len(audios)} 段音频")
             
-            response = requests.post(
-                url,
-                json=data,
-                headers={'Content-Type': 'application/json'},
-                timeout=10
-            )
+            texts = self.speech_client.transcribe_batch(audios, Config.SAMPLE_RATE)
             
-            if response.status_code == 200:
-                result = response.json()
-                if generate_answer:
-                    logger.info("问题已发送并生成回答")
+            for text in texts:
+                if text:
+                    logger.info(f"转录结果：{text}")
+                    self.send_to_backend(text, self.ai_mode_enabled)
                 else:
-                    logger.info("问题已发送（未生成回答）")
-            else:
-                logger.error(f"发送失败，状态码：{response.status_code}")
-                
-        except requests.exceptions.RequestException as e:
+                    logger.warning("转录结果为空")
+                    
+        except Exception as e:
+            logger.error(f"批量处理音频时出错：{str(e)}")
+    
+    def send_to_backend(self, question: str, generate_answer: bool = True, stream_id: Optional[str] = None):
+        """发送问题到后端服务器（启用发件箱时只写入本地，由后台线程发送）"""
+        data = {
+            "question": question,
+            "generate_answer": generate_answer,
+            # 幂等键：超时重试或发件箱重发时后端据此去重，不会重复创建对话和生成回答
+            "client_id": uuid.uuid4().hex,
+            # 记录提问时的会话：发件箱中的问题可能在下次启动（新的会话）时才补发
+            "session_id": self.session_id
+        }
+        if stream_id:
+            data["stream_id"] = stream_id
+        
+        if self.outbox:
+            try:
+                self.outbox.append(data)
+                self.outbox_sender.notify()
+                return
+            except Exception as e:
+                logger.error(f"写入发件箱失败，直接发送：{str(e)}")
+        
+        try:
+            status_code, result = self.backend.submit_question(data)
+            self.log_submit_result(status_code, result)
+        except BackendError as e:
             logger.error(f"网络请求失败：{str(e)}")
         except Exception as e:
             logger.error(f"发送到后端时出错：{str(e)}")
     
+    def log_submit_result(self, status_code: int, result: dict):
+        """记录后端对提交的问题的响应"""
+        if status_code == 202:
+            logger.info(f"问题已发送，回答生成中（对话 ID：{result.get('conversation_id')}）")
+        elif status_code == 200:
+            logger.info("问题已发送（未生成回答）")
+        elif status_code == 429:
+            logger.warning(f"后端限流，{result.get('retry_after', '?')} 秒后可重试")
+        else:
+            logger.error(f"发送失败，状态码：{status_code}")
+    
+    def send_partial_to_backend(self, stream_id: str, committed: str, tentative: str):
+        """把流式部分转录结果推送给后端（仅用于实时展示，不生成回答）"""
+        self.backend.send_partial({
+            "question": committed + tentative,
+            "committed": committed,
+            "tentative": tentative,
+            "stream_id": stream_id
+        })
+    
     def toggle_ai_mode(self):
         """切换 AI 模式"""
         self.ai_mode_enabled = not self.ai_mode_enabled
@@ -117,19 +219,12 @@ class InterviewAssistant:
     def test_backend_connection(self) -> bool:
         """测试后端连接"""
         try:
-            url = f"{Config.BACKEND_URL}/health"
-            response = requests.get(url, timeout=5)
-            
-            if response.status_code == 200:
-                data = response.json()
-                logger.info("后端服务器连接成功")
-                logger.info(f"Gemini 可用性：{data.get('gemini_available', False)}")
-                return True
-            else:
-                logger.error(f"后端服务器响应异常：{response.status_code}")
-                return False
+            data = self.backend.health()
+            logger.info("后端服务器连接成功")
+            logger.info(f"大模型可用性：{data.get('llm_available', False)}（{data.get('llm_provider')}）")
+            return True
                 
-        except requests.exceptions.RequestException as e:
+        except BackendError as e:
             logger.error(f"无法连接到后端服务器：{str(e)}")
             return False
     
@@ -143,6 +238,10 @@ class InterviewAssistant:
                 print("❌ 无法连接到后端服务器，请确保后端服务正在运行")
                 return
             
+            # 开始发送发件箱中的问题（包括上次运行未发送的）
+            if self.outbox_sender:
+                self.outbox_sender.start()
+            
             # 测试语音识别
             if not self.speech_client.test_connection():
                 print("❌ 语音识别服务连接测试失败")
@@ -159,6 +258,9 @@ class InterviewAssistant:
             self.setup_hotkeys()
             
             # 开始录音
+            if self.streaming_transcriber:
+                self.streaming_transcriber.start()
+                print("⚡ 流式转录模式已启用")
             self.audio_recorder.start_recording()
             
             self.is_running = True
@@ -166,6 +268,7 @@ class InterviewAssistant:
             print("\n🎤 面试助手已启动！")
             print("📝 正在监听麦克风...")
             print(f"🤖 AI 回答模式：{'启用' if self.ai_mode_enabled else '禁用'}")
+            print(f"🔖 面试会话 ID：{self.session_id}")
             print("⌨️  按 Cmd+Shift+N (macOS) 或 Ctrl+Shift+N (Windows/Linux) 切换 AI 模式")
             print("🛑 按 Ctrl+C 退出")
             
@@ -190,10 +293,30 @@ class InterviewAssistant:
         if self.audio_recorder:
             self.audio_recorder.cleanup()
         
+        # 等待流式转录完成最后的解码
+        if self.streaming_transcriber:
+            self.streaming_transcriber.stop()
+        
         # 停止快捷键监听
         if self.hotkey_listener:
             self.hotkey_listener.stop()
         
+        # 停止发件箱发送线程，未发送的问题保留到下次启动
+        if self.outbox_sender:
+            stopped = self.outbox_sender.stop(timeout=Config.BACKEND_TIMEOUT)
+            pending = len(self.outbox)
+            if pending:
+                logger.warning(f"还有 {pending} 条问题未发送，已保存在发件箱中")
+            if stopped:
+                self.outbox.close()
+            else:
+                # 发送线程仍在使用数据库连接，不关闭；已写入的记录都已落盘，进程退出时连接随之释放
+                logger.warning("发件箱发送线程未能及时退出，跳过关闭发件箱")
+            self.outbox_sender = None
+        
+        # 关闭后端连接
+        self.backend.close()
+        
         print("\n👋 面试助手已停止")
     
     def signal_handler(self, signum, frame):
@@ -0,0 +1,165 @@
+"""
+进程级模型注册表
+同一个 (模型名, 设备, 计算类型) 只加载一次，在各个提供商之间共享；
+支持首次使用时懒加载或后台线程预热，并记录加载耗时和内存占用
+"""
+
+import os
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ModelKey = Tuple[str, str, str]
+ModelLoader = Callable[[str, str, str], Any]
+
+
+def _current_rss() -> Optional[int]:
+    """当前进程常驻内存（字节），无法获取时返回 None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _model_bytes(model: Any) -> Optional[int]:
+    """PyTorch 模型参数和缓冲区占用的字节数，无法统计时返回 None"""
+    try:
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors) or None
+    except Exception:
+        return None
+
+
+class _ModelEntry:
+    """注册表中的一个模型"""
+
+    def __init__(self, key: ModelKey):
+        self.key = key
+        self.model: Any = None
+        self.error: Optional[Exception] = None
+        self.loading = False
+        self.loaded = threading.Event()
+        self.lock = threading.Lock()
+        self.load_seconds: Optional[float] = None
+        self.memory_bytes: Optional[int] = None
+        self.loaded_at: Optional[float] = None
+
+
+class ModelRegistry:
+    """模型注册表"""
+
+    def __init__(self):
+        self._entries: Dict[ModelKey, _ModelEntry] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, key: ModelKey) -> _ModelEntry:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _ModelEntry(key)
+                self._entries[key] = entry
+            return entry
+
+    def get(self, name: str, device: str, compute_type: str, loader: ModelLoader) -> Any:
+        """
+        获取模型，未加载时在当前线程加载；其他线程正在加载时等待其完成
+
+        Raises:
+            Exception: 加载失败时抛出加载时的异常
+        """
+        entry = self._entry((name, device, compute_type))
+        if entry.loaded.is_set():
+            if entry.error:
+                raise entry.error
+            return entry.model
+
+        with entry.lock:
+            if not entry.loaded.is_set():
+                self._load(entry, loader)
+
+        if entry.error:
+            raise entry.error
+        return entry.model
+
+    def warm_up(self, name: str, device: str, compute_type: str, loader: ModelLoader) -> threading.Thread:
+        """在后台线程预加载模型"""
+
+        def _warm_up():
+            try:
+                self.get(name, device, compute_type, loader)
+            except Exception:
+                pass  # 错误已记录，get 时会再次抛出
+
+        thread = threading.Thread(target=_warm_up, name=f"warm-up-{name}")
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def is_loaded(self, name: str, device: str, compute_type: str) -> bool:
+        entry = self._entries.get((name, device, compute_type))
+        return bool(entry and entry.loaded.is_set() and entry.error is None)
+
+    def has_failed(self, name: str, device: str, compute_type: str) -> bool:
+        entry = self._entries.get((name, device, compute_type))
+        return bool(entry and entry.error is not None)
+
+    def unload(self, name: str, device: str, compute_type: str):
+        """释放模型"""
+        with self._lock:
+            self._entries.pop((name, device, compute_type), None)
+
+    def get_stats(self) -> Dict[str, dict]:
+        """获取各模型的加载状态、加载耗时和内存占用"""
+        with self._lock:
+            entries = list(self._entries.values())
+
+        return {
+            '/'.join(entry.key): {
+                'loaded': entry.loaded.is_set() and entry.error is None,
+                'loading': entry.loading,
+                'error': str(entry.error) if entry.error else None,
+                'load_seconds': entry.load_seconds,
+                'memory_bytes': entry.memory_bytes,
+                'loaded_at': entry.loaded_at
+            }
+            for entry in entries
+        }
+
+    def _load(self, entry: _ModelEntry, loader: ModelLoader):
+        name, device, compute_type = entry.key
+        logger.info(f"加载模型：{name}（设备 {device}，计算类型 {compute_type}）")
+
+        entry.loading = True
+        rss_before = _current_rss()
+        started = time.time()
+        try:
+            entry.model = loader(name, device, compute_type)
+            entry.load_seconds = time.time() - started
+            entry.memory_bytes = _model_bytes(entry.model)
+            if entry.memory_bytes is None and rss_before is not None:
+                rss_after = _current_rss()
+                entry.memory_bytes = rss_after - rss_before if rss_after is not None else None
+            entry.loaded_at = time.time()
+
+            memory_mb = f"{entry.memory_bytes / 1024 / 1024:.0f} MB" if entry.memory_bytes else "未知"
+            logger.info(f"模型 {name} 加载成功，耗时 {entry.load_seconds:.1f} 秒，内存占用 {memory_mb}")
+        except Exception as e:
+            entry.error = e
+            logger.error(f"加载模型 {name} 失败：{str(e)}")
+        finally:
+            entry.loading = False
+            entry.loaded.set()
+
+
+# 进程级单例
+model_registry = ModelRegistry()
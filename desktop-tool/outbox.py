@@ -0,0 +1,253 @@
+"""
+待发送问题的本地发件箱
+转录结果先写入本地 SQLite，再由后台发送线程按写入顺序批量提交到后端：
+- 网络中断或后端不可用时不丢数据，恢复后自动补发（程序重启后也会继续发送）
+- 转录线程只做一次本地插入，不等待网络请求
+- 后端确认后删除记录，并定期回收数据库空间
+"""
+
+import itertools
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 批量提交函数：按顺序提交一批问题，返回已处理的前若干条的 (状态码, 响应内容)；
+# 连接失败时抛出异常
+SendBatch = Callable[[List[dict]], List[Tuple[int, dict]]]
+
+
+class Outbox:
+    """SQLite 发件箱（线程安全）"""
+
+    # 累计删除多少条记录后回收一次空间
+    COMPACT_EVERY = 200
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._deleted_since_compact = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            # auto_vacuum 只对新建的数据库生效，需在建表前设置
+            self._conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            # 每次插入都落盘，断电也不丢已经写入的问题
+            self._conn.execute('PRAGMA synchronous=FULL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS outbox (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    client_id TEXT NOT NULL UNIQUE,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT
+                )
+            ''')
+
+        pending = len(self)
+        if pending:
+            logger.info(f"发件箱中有 {pending} 条上次未发送的问题，将在连接后端后补发")
+
+    def append(self, payload: dict) -> str:
+        """
+        写入一条待发送的问题
+
+        Returns:
+            客户端 ID（同时写入 payload 的 client_id 字段，后端据此识别重发）
+        """
+        client_id = payload.get('client_id') or uuid.uuid4().hex
+        payload = dict(payload, client_id=client_id)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO outbox (client_id, payload, created_at) VALUES (?, ?, ?)',
+                (client_id, json.dumps(payload, ensure_ascii=False), time.time())
+            )
+        return client_id
+
+    def peek(self, limit: int) -> List[Tuple[int, dict]]:
+        """按写入顺序取出最早的 limit 条记录（不删除）"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT seq, payload FROM outbox ORDER BY seq LIMIT ?', (limit,)
+            ).fetchall()
+        return [(seq, json.loads(payload)) for seq, payload in rows]
+
+    def ack(self, seqs: List[int]):
+        """后端已确认，删除记录；累计删除一定数量后回收空间"""
+        if not seqs:
+            return
+        with self._lock:
+            self._conn.executemany('DELETE FROM outbox WHERE seq = ?', [(seq,) for seq in seqs])
+            self._deleted_since_compact += len(seqs)
+            if self._deleted_since_compact >= self.COMPACT_EVERY:
+                self._compact()
+
+    def mark_failed(self, seqs: List[int], error: str):
+        """记录发送失败（保留记录，稍后重试）"""
+        if not seqs:
+            return
+        with self._lock:
+            self._conn.executemany(
+                'UPDATE outbox SET attempts = attempts + 1, last_error = ? WHERE seq = ?',
+                [(error, seq) for seq in seqs]
+            )
+
+    def _compact(self):
+        """回收已删除记录占用的页，并截断 WAL 文件（调用方持有锁）"""
+        try:
+            self._conn.execute('PRAGMA incremental_vacuum')
+            self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        except sqlite3.Error as e:
+            logger.warning(f"发件箱空间回收失败：{str(e)}")
+        self._deleted_since_compact = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._deleted_since_compact:
+                self._compact()
+            self._conn.close()
+
+
+class OutboxSender:
+    """后台发送线程：按顺序批量提交发件箱中的问题，失败时指数退避重试"""
+
+    def __init__(self, outbox: Outbox, send_batch: SendBatch, batch_size: int = 20,
+                 base_delay: float = 1.0, max_delay: float = 60.0,
+                 on_result: Optional[Callable[[dict, int, dict], None]] = None):
+        """
+        Args:
+            send_batch: 批量提交函数
+            on_result: 每条问题得到后端响应后的回调 (payload, 状态码, 响应内容)
+        """
+        self.outbox = outbox
+        self.send_batch = send_batch
+        self.batch_size = max(1, batch_size)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_result = on_result
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._failures = 0
+        self._stats = {'sent': 0, 'dropped': 0, 'failed_batches': 0}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='outbox-sender', daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """有新问题写入，唤醒发送线程"""
+        self._wake.set()
+
+    def stop(self, timeout: float = 5.0) -> bool:
+        """
+        停止发送线程；未发送的问题留在发件箱中，下次启动时补发
+
+        Returns:
+            线程是否已退出；超时未退出（如正在等待后端响应）时发件箱仍在使用中，调用方不应关闭它
+        """
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                return False
+            self._thread = None
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self.outbox.peek(self.batch_size)
+            if not batch:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+
+            # 一批只提交同一会话的问题：上次运行遗留的问题仍按提问时的会话补发，幂等键也保持不变
+            session_id = batch[0][1].get('session_id')
+            batch = list(itertools.takewhile(lambda item: item[1].get('session_id') == session_id, batch))
+
+            delay = self._send(batch)
+            if delay:
+                self._stop.wait(delay)
+
+    def _send(self, batch: List[Tuple[int, dict]]) -> float:
+        """
+        提交一批问题
+
+        Returns:
+            需要等待多久再重试（秒），0 表示可以立即发送下一批
+        """
+        try:
+            results = self.send_batch([payload for _, payload in batch])
+        except Exception as e:
+            self.outbox.mark_failed([seq for seq, _ in batch], str(e))
+            return self._backoff(str(e))
+
+        done = []
+        retry_after = 0
+        error = '批量提交中断'
+        for (seq, payload), (status_code, body) in zip(batch, results):
+            if status_code in (409, 429) or status_code >= 500:
+                # 重复请求仍在处理、限流或服务端错误：保留这条及之后的记录，稍后按顺序重发
+                retry_after = body.get('retry_after', 0)
+                error = f"HTTP {status_code}"
+                self.outbox.mark_failed([seq], error)
+                break
+
+            if 200 <= status_code < 300:
+                self._stats['sent'] += 1
+            else:
+                # 其他 4xx 重发也不会成功，丢弃
+                self._stats['dropped'] += 1
+                logger.error(f"后端拒绝了问题（状态码 {status_code}），已丢弃：{body.get('error', '')}")
+            done.append(seq)
+            self._notify_result(payload, status_code, body)
+
+        self.outbox.ack(done)
+        if len(done) < len(batch):
+            return max(retry_after, self._backoff(error))
+
+        self._failures = 0
+        return 0
+
+    def _backoff(self, error: str) -> float:
+        """连续失败时的等待时间（指数退避 + 全随机抖动）"""
+        self._stats['failed_batches'] += 1
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** self._failures)))
+        self._failures += 1
+        logger.warning(f"发送到后端失败，{delay:.1f} 秒后重试（待发送 {len(self.outbox)} 条）：{error}")
+        return delay
+
+    def _notify_result(self, payload: dict, status_code: int, body: dict):
+        if not self.on_result:
+            return
+        try:
+            self.on_result(payload, status_code, body)
+        except Exception as e:
+            logger.error(f"发送结果回调出错：{str(e)}")
+
+    def get_stats(self) -> Dict[str, int]:
+        stats = dict(self._stats)
+        stats['pending'] = len(self.outbox)
+        return stats
@@ -0,0 +1,298 @@
+"""
+音频片段队列与转录工作线程池
+录音线程只负责把切好的音频片段放入有界队列，转录由独立的工作线程完成，
+避免 Whisper 推理期间阻塞 stream.read 导致音频溢出丢失
+"""
+
+import threading
+import time
+import logging
+from collections import deque
+from typing import Callable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 队列满时的背压策略
+POLICY_DROP_OLDEST = 'drop_oldest'
+POLICY_BLOCK = 'block'
+POLICY_COALESCE = 'coalesce'
+SUPPORTED_POLICIES = (POLICY_DROP_OLDEST, POLICY_BLOCK, POLICY_COALESCE)
+
+
+class AudioSegment:
+    """一段待转录的音频（交织存储的 int16 PCM）"""
+
+    def __init__(self, audio: np.ndarray, sample_rate: int, channels: int, seq: int):
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = audio.dtype.itemsize
+        self.seq = seq
+        self.created_at = time.time()
+
+    @property
+    def duration(self) -> float:
+        """音频时长（秒）"""
+        return len(self.audio) / float(self.channels * self.sample_rate)
+
+    @property
+    def pcm(self) -> bytes:
+        """原始 PCM 字节"""
+        return self.audio.tobytes()
+
+    def samples(self) -> np.ndarray:
+        """以 int16 数组形式返回 PCM（不复制数据），多声道时形状为 (帧数, 声道数)"""
+        if self.channels > 1:
+            return self.audio.reshape(-1, self.channels)
+        return self.audio
+
+    def merge(self, other: 'AudioSegment'):
+        """把后一段音频拼接到当前片段末尾"""
+        self.audio = np.concatenate((self.audio, other.audio))
+
+
+class SegmentQueue:
+    """有界音频片段队列，支持 drop_oldest / block / coalesce 三种背压策略"""
+
+    def __init__(self, maxsize: int = 8, policy: str = POLICY_DROP_OLDEST, block_timeout: float = 1.0):
+        if maxsize < 1:
+            raise ValueError("队列容量必须大于 0")
+        if policy not in SUPPORTED_POLICIES:
+            raise ValueError(f"不支持的背压策略：{policy}，可选：{', '.join(SUPPORTED_POLICIES)}")
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._closed = False
+
+        # 队列指标
+        self._enqueued = 0
+        self._dequeued = 0
+        self._dropped = 0
+        self._coalesced = 0
+        self._max_depth = 0
+        self._total_wait = 0.0
+
+    def put(self, segment: AudioSegment) -> bool:
+        """
+        放入一段音频
+
+        Returns:
+            bool: 片段是否进入队列（合并也算进入）
+        """
+        with self._lock:
+            if self._closed:
+                return False
+
+            if len(self._items) >= self.maxsize:
+                if self.policy == POLICY_DROP_OLDEST:
+                    dropped = self._items.popleft()
+                    self._dropped += 1
+                    logger.warning(f"转录队列已满，丢弃最旧片段 #{dropped.seq}")
+                elif self.policy == POLICY_COALESCE:
+                    self._items[-1].merge(segment)
+                    self._coalesced += 1
+                    logger.info(f"转录队列已满，片段 #{segment.seq} 已合并到 #{self._items[-1].seq}")
+                    return True
+                else:
+                    deadline = time.time() + self.block_timeout
+                    while len(self._items) >= self.maxsize and not self._closed:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            self._dropped += 1
+                            logger.warning(f"转录队列等待超时，丢弃片段 #{segment.seq}")
+                            return False
+                        self._not_full.wait(remaining)
+                    if self._closed:
+                        return False
+
+            self._items.append(segment)
+            self._enqueued += 1
+            self._max_depth = max(self._max_depth, len(self._items))
+            self._not_empty.notify()
+            return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[AudioSegment]:
+        """取出一段音频，超时或队列关闭且为空时返回 None"""
+        with self._lock:
+            if not self._items and not self._closed:
+                self._not_empty.wait(timeout)
+            if not self._items:
+                return None
+
+            segment = self._items.popleft()
+            self._dequeued += 1
+            self._total_wait += time.time() - segment.created_at
+            self._not_full.notify()
+            return segment
+
+    def get_batch(self, max_items: int, max_wait: float, timeout: Optional[float] = None) -> List[AudioSegment]:
+        """
+        取出一批音频：等到第一段后，最多再等 max_wait 秒凑满 max_items 段
+
+        Returns:
+            List[AudioSegment]: 按入队顺序排列的片段，超时或队列关闭且为空时返回空列表
+        """
+        first = self.get(timeout)
+        if first is None:
+            return []
+
+        batch = [first]
+        deadline = time.time() + max_wait
+        with self._lock:
+            while len(batch) < max_items:
+                if not self._items:
+                    remaining = deadline - time.time()
+                    if remaining <= 0 or self._closed:
+                        break
+                    self._not_empty.wait(remaining)
+                    continue
+
+                segment = self._items.popleft()
+                self._dequeued += 1
+                self._total_wait += time.time() - segment.created_at
+                batch.append(segment)
+            self._not_full.notify_all()
+
+        return batch
+
+    def close(self):
+        """关闭队列，唤醒所有等待者；已入队的片段仍可被取出"""
+        with self._lock:
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def reopen(self):
+        """重新打开队列"""
+        with self._lock:
+            self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+    def get_metrics(self) -> dict:
+        """获取队列指标"""
+        with self._lock:
+            return {
+                'depth': len(self._items),
+                'max_depth': self._max_depth,
+                'capacity': self.maxsize,
+                'policy': self.policy,
+                'enqueued': self._enqueued,
+                'dequeued': self._dequeued,
+                'dropped': self._dropped,
+                'coalesced': self._coalesced,
+                'avg_wait_seconds': self._total_wait / self._dequeued if self._dequeued else 0.0
+            }
+
+
+class TranscriptionWorkerPool:
+    """
+    从片段队列取数据并调用处理函数的工作线程池
+
+    设置 batch_handler 且 max_batch_size > 1 时启用微批处理：
+    每个工作线程一次取出最多 max_batch_size 段（最多等待 max_batch_wait 秒）交给 batch_handler
+    """
+
+    def __init__(self, segment_queue: SegmentQueue, handler: Callable[[AudioSegment], None], num_workers: int = 1,
+                 batch_handler: Optional[Callable[[List[AudioSegment]], None]] = None,
+                 max_batch_size: int = 1, max_batch_wait: float = 0.2):
+        self.segment_queue = segment_queue
+        self.handler = handler
+        self.num_workers = max(1, num_workers)
+        self.batch_handler = batch_handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_wait = max_batch_wait
+        self._workers: List[threading.Thread] = []
+        self._running = False
+        self._batches = 0
+        self._batched_segments = 0
+
+    @property
+    def batching(self) -> bool:
+        return self.batch_handler is not None and self.max_batch_size > 1
+
+    def start(self):
+        """启动工作线程"""
+        if self._running:
+            return
+
+        self._running = True
+        self.segment_queue.reopen()
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"transcriber-{i}")
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+        logger.info(f"已启动 {self.num_workers} 个转录工作线程")
+
+    def stop(self, timeout: float = 30.0):
+        """停止工作线程，等待队列中剩余片段处理完毕"""
+        if not self._running:
+            return
+
+        self.segment_queue.close()
+        deadline = time.time() + timeout
+        for worker in self._workers:
+            worker.join(timeout=max(0.0, deadline - time.time()))
+        self._workers = []
+        self._running = False
+
+        remaining = len(self.segment_queue)
+        if remaining:
+            logger.warning(f"转录线程停止时仍有 {remaining} 个片段未处理")
+        logger.info("转录工作线程已停止")
+
+    def get_metrics(self) -> dict:
+        """获取批处理指标"""
+        return {
+            'batches': self._batches,
+            'avg_batch_size': self._batched_segments / self._batches if self._batches else 0.0
+        }
+
+    def _worker_loop(self):
+        """工作线程主循环"""
+        if self.batching:
+            self._batch_worker_loop()
+            return
+
+        while True:
+            segment = self.segment_queue.get(timeout=0.5)
+            if segment is None:
+                if self.segment_queue.closed:
+                    break
+                continue
+
+            try:
+                self.handler(segment)
+            except Exception as e:
+                logger.error(f"处理音频片段 #{segment.seq} 时出错：{str(e)}")
+
+    def _batch_worker_loop(self):
+        """微批处理模式的工作线程主循环"""
+        while True:
+            batch = self.segment_queue.get_batch(self.max_batch_size, self.max_batch_wait, timeout=0.5)
+            if not batch:
+                if self.segment_queue.closed:
+                    break
+                continue
+
+            self._batches += 1
+            self._batched_segments += len(batch)
+            try:
+                self.batch_handler(batch)
+            except Exception as e:
+                logger.error(f"批量处理音频片段 #{batch[0].seq}-#{batch[-1].seq} 时出错：{str(e)}")
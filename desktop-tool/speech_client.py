@@ -3,50 +3,142 @@
 支持本地 Whisper、OpenAI、腾讯云、阿里云、百度云等多个语音识别服务
 """
 
+import io
 import os
+import time
+import wave
 import logging
-from typing import Optional
+from typing import List, Optional, Union
 from abc import ABC, abstractmethod
+
+import numpy as np
+
 from config import Config
+from asr_engines import SUPPORTED_ENGINES, WhisperEngine, check_engine_installed, load_whisper_engine, whisper_model_key
+from model_registry import model_registry
 
 logger = logging.getLogger(__name__)
 
+# Whisper 模型要求的输入采样率
+WHISPER_SAMPLE_RATE = 16000
+
+# 音频输入：文件路径，或内存中的 PCM（int16/float32 数组、memoryview、bytes）
+AudioInput = Union[str, np.ndarray, memoryview, bytes]
+
+def to_float32_pcm(audio: AudioInput, sample_rate: int, target_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """
+    把内存中的 PCM 转为单声道 float32（-1~1），必要时重采样
+
+    Args:
+        audio: int16/float32 数组，或 int16 PCM 的 memoryview/bytes
+        sample_rate: 输入采样率
+        target_rate: 目标采样率
+
+    Returns:
+        np.ndarray: float32 单声道音频
+    """
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        audio = np.frombuffer(audio, dtype=np.int16)
+
+    if audio.ndim > 1:
+        # 多声道取均值后转回原类型，int16 输入仍按 int16 的范围归一化
+        audio = audio.mean(axis=1).astype(audio.dtype)
+
+    if audio.dtype == np.int16:
+        samples = audio.astype(np.float32) / 32768.0
+    else:
+        samples = audio.astype(np.float32, copy=False)
+
+    # 采集采样率与模型一致时（默认 16k）不做重采样
+    if sample_rate != target_rate and len(samples) > 0:
+        duration = len(samples) / float(sample_rate)
+        target_len = int(round(duration * target_rate))
+        samples = np.interp(
+            np.linspace(0, len(samples) - 1, target_len),
+            np.arange(len(samples)),
+            samples
+        ).astype(np.float32)
+
+    return samples
+
+def to_int16_pcm(audio: AudioInput) -> np.ndarray:
+    """把内存中的 PCM 转为单声道 int16"""
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        return np.frombuffer(audio, dtype=np.int16)
+
+    if audio.ndim > 1:
+        audio = audio.mean(axis=1).astype(audio.dtype)
+
+    if audio.dtype == np.int16:
+        return audio
+    return (np.clip(audio, -1.0, 1.0) * 32767).astype(np.int16)
+
+def encode_wav_bytes(audio: AudioInput, sample_rate: int) -> bytes:
+    """
+    获取 WAV 格式的音频字节，供云端 API 上传
+
+    文件路径直接读取文件内容；内存 PCM 在内存中编码一次，不落盘
+    """
+    if isinstance(audio, str):
+        with open(audio, 'rb') as f:
+            return f.read()
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(to_int16_pcm(audio).tobytes())
+    return buffer.getvalue()
+
 class SpeechRecognitionProvider(ABC):
     """语音识别提供商基类"""
     
     @abstractmethod
-    def transcribe(self, audio_file_path: str) -> Optional[str]:
-        """转录音频文件为文本"""
+    def transcribe(self, audio: AudioInput, sample_rate: int = Config.SAMPLE_RATE) -> Optional[str]:
+        """
+        转录音频为文本
+
+        Args:
+            audio: 音频文件路径，或内存中的 PCM 数据
+            sample_rate: 内存 PCM 的采样率（文件路径输入时忽略）
+        """
         pass
     
+    def transcribe_batch(self, audios: List[AudioInput], sample_rate: int = Config.SAMPLE_RATE) -> List[Optional[str]]:
+        """批量转录，结果与输入顺序一致；默认逐段转录"""
+        return [self.transcribe(audio, sample_rate) for audio in audios]
+    
     @abstractmethod
     def test_connection(self) -> bool:
         """测试连接是否正常"""
         pass
 
 class LocalWhisperProvider(SpeechRecognitionProvider):
-    """本地 Whisper 提供商"""
+    """本地 Whisper 提供商（模型由进程级注册表懒加载并共享，推理引擎可选）"""
     
-    def __init__(self):
-        try:
-            import whisper
-            self.whisper = whisper
-            logger.info(f"加载本地 Whisper 模型：{Config.WHISPER_MODEL}")
-            self.model = whisper.load_model(Config.WHISPER_MODEL)
-            logger.info("本地 Whisper 模型加载成功")
-        except ImportError:
-            logger.error("未安装 openai-whisper，请运行: pip install openai-whisper")
-            raise
-        except Exception as e:
-            logger.error(f"加载本地 Whisper 模型失败：{str(e)}")
-            raise
+    def __init__(self, engine: Optional[str] = None):
+        self.engine = (engine or Config.WHISPER_ENGINE).lower()
+        if self.engine not in SUPPORTED_ENGINES:
+            raise ValueError(f"不支持的 Whisper 推理引擎：{self.engine}，可选：{', '.join(SUPPORTED_ENGINES)}")
+        check_engine_installed(self.engine)
+        
+        self.model_key = whisper_model_key(self.engine)
+        if Config.WHISPER_PRELOAD:
+            model_registry.warm_up(*self.model_key, load_whisper_engine)
     
-    def transcribe(self, audio_file_path: str) -> Optional[str]:
+    @property
+    def model(self) -> WhisperEngine:
+        """首次访问时加载模型，预热未完成时等待"""
+        return model_registry.get(*self.model_key, load_whisper_engine)
+    
+    def transcribe(self, audio: AudioInput, sample_rate: int = Config.SAMPLE_RATE) -> Optional[str]:
         try:
+            # 内存 PCM 直接送入模型，跳过写文件和 ffmpeg 解码；文件路径由引擎自行加载
+            model_input = audio if isinstance(audio, str) else to_float32_pcm(audio, sample_rate)
             result = self.model.transcribe(
-                audio_file_path,
-                language=Config.SPEECH_LANGUAGE.split('-')[0] if Config.SPEECH_LANGUAGE else None,
-                fp16=False
+                model_input,
+                language=Config.SPEECH_LANGUAGE.split('-')[0] if Config.SPEECH_LANGUAGE else None
             )
             
             text = result.get('text', '').strip()
@@ -61,8 +153,28 @@ class LocalWhisperProvider(SpeechRecognitionProvider):
             logger.error(f"本地 Whisper 转录失败：{str(e)}")
             return None
     
+    def transcribe_batch(self, audios: List[AudioInput], sample_rate: int = Config.SAMPLE_RATE) -> List[Optional[str]]:
+        """把多段内存音频合成一个批次推理"""
+        if any(isinstance(audio, str) for audio in audios):
+            return super().transcribe_batch(audios, sample_rate)
+        
+        try:
+            started = time.time()
+            results = self.model.transcribe_batch(
+                [to_float32_pcm(audio, sample_rate) for audio in audios],
+                language=Config.SPEECH_LANGUAGE.split('-')[0] if Config.SPEECH_LANGUAGE else None
+            )
+            logger.info(f"本地 Whisper 批量转录 {len(audios)} 段，耗时 {time.time() - started:.2f} 秒")
+            
+            return [result.get('text', '').strip() or None for result in results]
+            
+        except Exception as e:
+            logger.error(f"本地 Whisper 批量转录失败：{str(e)}")
+            return [None] * len(audios)
+    
     def test_connection(self) -> bool:
-        return self.model is not None
+        # 不阻塞等待预热，只有加载失败才视为不可用
+        return not model_registry.has_failed(*self.model_key)
 
 class OpenAIProvider(SpeechRecognitionProvider):
     """OpenAI Whisper API 提供商"""
@@ -80,14 +192,15 @@ class OpenAIProvider(SpeechRecognitionProvider):
             logger.error("未安装 openai，请运行: pip install openai")
             raise
     
-    def transcribe(self, audio_file_path: str) -> Optional[str]:
+    def transcribe(self, audio: AudioInput, sample_rate: int = Config.SAMPLE_RATE) -> Optional[str]:
         try:
-            with open(audio_file_path, 'rb') as audio_file:
-                response = self.openai.Audio.transcribe(
-                    model="whisper-1",
-                    file=audio_file,
-                    language=Config.SPEECH_LANGUAGE.split('-')[0] if Config.SPEECH_LANGUAGE else None
-                )
+            audio_file = io.BytesIO(encode_wav_bytes(audio, sample_rate))
+            audio_file.name = "audio.wav"  # API 根据文件名判断格式
+            response = self.openai.Audio.transcribe(
+                model="whisper-1",
+                file=audio_file,
+                language=Config.SPEECH_LANGUAGE.split('-')[0] if Config.SPEECH_LANGUAGE else None
+            )
             
             text = response.get('text', '').strip()
             if text:
@@ -138,13 +251,12 @@ class TencentProvider(SpeechRecognitionProvider):
             logger.error("未安装腾讯云 SDK，请运行: pip install tencentcloud-sdk-python")
             raise
     
-    def transcribe(self, audio_file_path: str) -> Optional[str]:
+    def transcribe(self, audio: AudioInput, sample_rate: int = Config.SAMPLE_RATE) -> Optional[str]:
         try:
             import base64
             
-            # 读取音频文件并转换为 base64
-            with open(audio_file_path, 'rb') as f:
-                audio_data = f.read()
+            # 获取 WAV 数据并转换为 base64
+            audio_data = encode_wav_bytes(audio, sample_rate)
             
             audio_base64 = base64.b64encode(audio_data).decode('utf-8')
             
@@ -213,7 +325,7 @@ class AliyunProvider(SpeechRecognitionProvider):
             logger.error("未安装阿里云 SDK，请运行: pip install alibabacloud_nls_meta20190103")
             raise
     
-    def transcribe(self, audio_file_path: str) -> Optional[str]:
+    def transcribe(self, audio: AudioInput, sample_rate: int = Config.SAMPLE_RATE) -> Optional[str]:
         try:
             # 阿里云语音识别实现
             # 注意：这里需要根据阿里云的具体 API 文档实现
@@ -246,14 +358,13 @@ class BaiduProvider(SpeechRecognitionProvider):
             logger.error("未安装百度 SDK，请运行: pip install baidu-aip")
             raise
     
-    def transcribe(self, audio_file_path: str) -> Optional[str]:
+    def transcribe(self, audio: AudioInput, sample_rate: int = Config.SAMPLE_RATE) -> Optional[str]:
         try:
-            # 读取音频文件
-            with open(audio_file_path, 'rb') as f:
-                audio_data = f.read()
+            # 获取 WAV 数据
+            audio_data = encode_wav_bytes(audio, sample_rate)
             
             # 调用百度 API
-            result = self.client.asr(audio_data, 'wav', 16000, {
+            result = self.client.asr(audio_data, 'wav', sample_rate, {
                 'dev_pid': 1537,  # 中文普通话
             })
             
@@ -292,6 +403,8 @@ class SpeechRecognitionClient:
         try:
             if provider_name == 'local_whisper':
                 return LocalWhisperProvider()
+            elif provider_name == 'faster_whisper':
+                return LocalWhisperProvider(engine='ctranslate2')
             elif provider_name == 'openai':
                 return OpenAIProvider()
             elif provider_name == 'tencent':
@@ -305,18 +418,25 @@ class SpeechRecognitionClient:
                 return LocalWhisperProvider()
         except Exception as e:
             logger.error(f"创建语音识别提供商失败：{str(e)}")
-            logger.info("回退到本地 Whisper")
-            return LocalWhisperProvider()
+            logger.info("回退到本地 Whisper（pytorch 引擎）")
+            return LocalWhisperProvider(engine='pytorch')
+
+    def transcribe_audio(self, audio: AudioInput, sample_rate: int = Config.SAMPLE_RATE) -> Optional[str]:
+        """
+        转录音频
 
-    def transcribe_audio(self, audio_file_path: str) -> Optional[str]:
-        """转录音频文件"""
+        Args:
+            audio: 音频文件路径，或内存中的 PCM 数据
+            sample_rate: 内存 PCM 的采样率
+        """
+        is_file = isinstance(audio, str)
         try:
-            if not os.path.exists(audio_file_path):
-                logger.error(f"音频文件不存在：{audio_file_path}")
+            if is_file and not os.path.exists(audio):
+                logger.error(f"音频文件不存在：{audio}")
                 return None
 
             logger.info(f"使用 {Config.SPEECH_PROVIDER} 进行语音识别")
-            text = self.provider.transcribe(audio_file_path)
+            text = self.provider.transcribe(audio, sample_rate)
 
             return text
 
@@ -325,7 +445,17 @@ class SpeechRecognitionClient:
             return None
         finally:
             # 清理临时音频文件
-            self._cleanup_audio_file(audio_file_path)
+            if is_file:
+                self._cleanup_audio_file(audio)
+
+    def transcribe_batch(self, audios: List[AudioInput], sample_rate: int = Config.SAMPLE_RATE) -> List[Optional[str]]:
+        """批量转录内存音频，结果与输入顺序一致"""
+        try:
+            logger.info(f"使用 {Config.SPEECH_PROVIDER} 批量识别 {len(audios)} 段音频")
+            return self.provider.transcribe_batch(audios, sample_rate)
+        except Exception as e:
+            logger.error(f"批量音频转录失败：{str(e)}")
+            return [None] * len(audios)
 
     def test_connection(self) -> bool:
         """测试连接"""
@@ -344,11 +474,19 @@ class SpeechRecognitionClient:
         except Exception as e:
             logger.warning(f"删除临时音频文件失败：{str(e)}")
 
+    def _local_model_description(self) -> Optional[str]:
+        """本地 Whisper 的模型描述（模型名、推理引擎、计算类型）"""
+        if not isinstance(self.provider, LocalWhisperProvider):
+            return None
+        _, _, compute_type = self.provider.model_key
+        return f"{Config.WHISPER_MODEL}（{self.provider.engine}, {compute_type}）"
+
     def get_provider_info(self) -> dict:
         """获取当前提供商信息"""
         return {
             'provider': Config.SPEECH_PROVIDER,
             'language': Config.SPEECH_LANGUAGE,
-            'model': getattr(Config, 'WHISPER_MODEL', None) if Config.SPEECH_PROVIDER == 'local_whisper' else None,
-            'connected': self.test_connection()
+            'model': self._local_model_description(),
+            'connected': self.test_connection(),
+            'model_stats': model_registry.get_stats()
         }
@@ -0,0 +1,226 @@
+"""
+流式转录
+在说话过程中按固定间隔对不断增长的音频缓冲区重新解码，
+使用 LocalAgreement 策略提交稳定前缀，边说边输出部分结果
+"""
+
+import re
+import threading
+import time
+import logging
+from collections import deque
+from typing import Callable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 英文单词/数字作为一个词元，中文等其他字符逐字作为词元
+_TOKEN_PATTERN = re.compile(r"[A-Za-z0-9'\-]+|\S")
+
+
+def tokenize(text: str) -> List[str]:
+    """把转录文本切分为用于前缀比较的词元"""
+    return _TOKEN_PATTERN.findall(text or '')
+
+
+def detokenize(tokens: List[str]) -> str:
+    """把词元拼回文本，只在两个英文/数字词元之间补空格"""
+    text = ''
+    for token in tokens:
+        if text and text[-1].isascii() and text[-1].isalnum() and token[0].isascii() and token[0].isalnum():
+            text += ' '
+        text += token
+    return text
+
+
+class LocalAgreement:
+    """
+    LocalAgreement-2 前缀提交策略
+
+    连续两次解码结果的公共前缀视为稳定，提交后不再撤回
+    """
+
+    def __init__(self):
+        self.committed: List[str] = []
+        self._previous: List[str] = []
+
+    def update(self, hypothesis: List[str]) -> List[str]:
+        """
+        输入一次新的完整解码结果
+
+        Returns:
+            List[str]: 本次新提交的词元
+        """
+        start = len(self.committed)
+        new_tail = hypothesis[start:]
+        prev_tail = self._previous[start:]
+
+        agreed = []
+        for a, b in zip(prev_tail, new_tail):
+            if a != b:
+                break
+            agreed.append(a)
+
+        self.committed.extend(agreed)
+        self._previous = hypothesis
+        return agreed
+
+    def tentative(self) -> List[str]:
+        """最近一次解码中尚未提交的部分"""
+        return self._previous[len(self.committed):]
+
+    def reset(self):
+        self.committed = []
+        self._previous = []
+
+
+class StreamingTranscriber:
+    """
+    流式转录器
+
+    录音线程调用 feed / end_segment / discard_segment，解码在独立线程中进行，
+    不会阻塞录音
+    """
+
+    def __init__(
+        self,
+        transcribe_fn: Callable[[np.ndarray, int], Optional[str]],
+        sample_rate: int,
+        on_partial: Callable[[int, str, str], None],
+        on_final: Callable[[int, str], None],
+        interval: float = 0.5,
+        max_window: float = 30.0
+    ):
+        """
+        Args:
+            transcribe_fn: 转录函数，参数为 (int16 PCM 数组, 采样率)
+            sample_rate: 音频采样率
+            on_partial: 部分结果回调，参数为 (片段 ID, 已提交文本, 未稳定文本)
+            on_final: 最终结果回调，参数为 (片段 ID, 完整文本)
+            interval: 部分解码间隔（秒）
+            max_window: 部分解码的最长音频窗口（秒），超过后只等待最终解码
+        """
+        self.transcribe_fn = transcribe_fn
+        self.sample_rate = sample_rate
+        self.on_partial = on_partial
+        self.on_final = on_final
+        self.interval = interval
+        self.max_samples = int(max_window * sample_rate)
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._chunks: List[np.ndarray] = []
+        self._num_samples = 0
+        self._decoded_samples = 0
+        self._segment_id = 0
+        self._agreement = LocalAgreement()
+        self._pending_finals = deque()
+
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """启动解码线程"""
+        if self._running:
+            return
+
+        self._running = True
+        self._thread = threading.Thread(target=self._decode_loop, name="streaming-transcriber")
+        self._thread.daemon = True
+        self._thread.start()
+        logger.info(f"流式转录已启动，解码间隔 {self.interval} 秒")
+
+    def stop(self, timeout: float = 30.0):
+        """停止解码线程，等待尚未完成的最终解码"""
+        if not self._running:
+            return
+
+        self._running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+        logger.info("流式转录已停止")
+
+    def feed(self, chunk: np.ndarray):
+        """追加一块音频（在录音线程中调用）"""
+        with self._lock:
+            self._chunks.append(chunk)
+            self._num_samples += len(chunk)
+
+    def end_segment(self):
+        """结束当前片段并排队做最终解码"""
+        with self._lock:
+            if self._chunks:
+                audio = np.concatenate(self._chunks)
+                self._pending_finals.append((self._segment_id, audio, self._agreement))
+            self._reset_segment()
+        self._wakeup.set()
+
+    def discard_segment(self):
+        """丢弃当前片段（例如时长过短）"""
+        with self._lock:
+            self._reset_segment()
+
+    def _reset_segment(self):
+        self._chunks = []
+        self._num_samples = 0
+        self._decoded_samples = 0
+        self._segment_id += 1
+        self._agreement = LocalAgreement()
+
+    def _decode_loop(self):
+        """解码线程主循环：优先处理最终解码，其次按间隔做部分解码"""
+        while self._running or self._pending_finals:
+            if self._pending_finals:
+                self._decode_final(*self._pending_finals.popleft())
+                continue
+
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._running and not self._pending_finals:
+                self._decode_partial()
+
+    def _decode_partial(self):
+        """对当前增长中的缓冲区做一次部分解码"""
+        with self._lock:
+            if self._num_samples == self._decoded_samples or self._num_samples > self.max_samples:
+                return
+            audio = np.concatenate(self._chunks)
+            self._chunks = [audio]
+            self._decoded_samples = self._num_samples
+            segment_id = self._segment_id
+            agreement = self._agreement
+
+        started = time.time()
+        text = self.transcribe_fn(audio, self.sample_rate)
+        elapsed = time.time() - started
+
+        with self._lock:
+            if segment_id != self._segment_id:
+                # 解码期间片段已结束，部分结果作废
+                return
+            newly_committed = agreement.update(tokenize(text))
+            committed = detokenize(agreement.committed)
+            tentative = detokenize(agreement.tentative())
+
+        logger.debug(f"部分解码 {len(audio) / self.sample_rate:.1f} 秒音频耗时 {elapsed:.2f} 秒")
+        if newly_committed or tentative:
+            try:
+                self.on_partial(segment_id, committed, tentative)
+            except Exception as e:
+                logger.error(f"处理部分转录结果时出错：{str(e)}")
+
+    def _decode_final(self, segment_id: int, audio: np.ndarray, agreement: LocalAgreement):
+        """对完整片段做最终解码"""
+        try:
+            text = self.transcribe_fn(audio, self.sample_rate)
+            if not text and agreement.committed:
+                # 最终解码失败时退回到已提交的部分
+                text = detokenize(agreement.committed)
+            if text:
+                self.on_final(segment_id, text)
+            else:
+                logger.warning("流式转录最终结果为空")
+        except Exception as e:
+            logger.error(f"处理最终转录结果时出错：{str(e)}")
@@ -0,0 +1,337 @@
+"""
+语音活动检测（VAD）
+支持自适应噪声底的能量检测、谱通量检测，以及可选的 WebRTC / Silero 模型，
+并提供带预录（pre-roll）和拖尾（hangover）的分段状态机
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+import numpy as np
+
+from audio_buffer import AudioRingBuffer
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# 分段事件
+EVENT_SPEECH_START = 'speech_start'
+EVENT_SPEECH = 'speech'
+EVENT_SPEECH_END = 'speech_end'
+
+_EMPTY = np.zeros(0, dtype=np.int16)
+
+
+def to_mono_float(samples: np.ndarray, channels: int = 1) -> np.ndarray:
+    """把 int16 PCM 转为单声道 float64（-1~1），避免在 int16 上平方溢出"""
+    audio = samples.astype(np.float64) / 32768.0
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    return audio
+
+
+class VoiceActivityDetector(ABC):
+    """语音活动检测器基类"""
+
+    def __init__(self, sample_rate: int, channels: int = 1):
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+    @abstractmethod
+    def is_speech(self, samples: np.ndarray) -> bool:
+        """判断一块 int16 PCM 是否包含语音"""
+        pass
+
+    def reset(self):
+        """重置内部状态"""
+        pass
+
+
+class EnergyVAD(VoiceActivityDetector):
+    """
+    能量检测，噪声底自适应
+
+    阈值取 max(固定下限, 噪声底 × 倍数)，噪声底只在非语音块上更新：
+    下降快、上升慢，避免被语音本身抬高
+    """
+
+    def __init__(self, sample_rate: int, channels: int = 1, min_threshold: float = 0.01,
+                 noise_ratio: float = 3.0, adapt_rate: float = 0.05):
+        super().__init__(sample_rate, channels)
+        self.min_threshold = min_threshold
+        self.noise_ratio = noise_ratio
+        self.adapt_rate = adapt_rate
+        self.noise_floor = 0.0
+
+    def is_speech(self, samples: np.ndarray) -> bool:
+        audio = to_mono_float(samples, self.channels)
+        rms = float(np.sqrt(np.mean(audio * audio))) if len(audio) else 0.0
+
+        threshold = max(self.min_threshold, self.noise_floor * self.noise_ratio)
+        speech = rms >= threshold
+
+        if not speech:
+            rate = 0.5 if rms < self.noise_floor else self.adapt_rate
+            self.noise_floor += rate * (rms - self.noise_floor)
+
+        return speech
+
+    def reset(self):
+        self.noise_floor = 0.0
+
+
+class SpectralFluxVAD(EnergyVAD):
+    """
+    谱通量检测
+
+    语音的频谱随时间快速变化，稳态噪声（风扇、空调）的谱通量较低；
+    能量门限之上再要求谱通量超过其自适应噪声底
+    """
+
+    def __init__(self, sample_rate: int, channels: int = 1, min_threshold: float = 0.01,
+                 noise_ratio: float = 3.0, adapt_rate: float = 0.05, flux_ratio: float = 2.0):
+        super().__init__(sample_rate, channels, min_threshold, noise_ratio, adapt_rate)
+        self.flux_ratio = flux_ratio
+        self._prev_spectrum: Optional[np.ndarray] = None
+        self._flux_floor: Optional[float] = None
+
+    def is_speech(self, samples: np.ndarray) -> bool:
+        energetic = super().is_speech(samples)
+
+        audio = to_mono_float(samples, self.channels)
+        spectrum = np.abs(np.fft.rfft(audio * np.hanning(len(audio))))
+        total = spectrum.sum()
+        if total > 0:
+            spectrum = spectrum / total
+
+        if self._prev_spectrum is None or len(self._prev_spectrum) != len(spectrum):
+            self._prev_spectrum = spectrum
+            return False
+
+        flux = float(np.sum(np.maximum(spectrum - self._prev_spectrum, 0.0)))
+        self._prev_spectrum = spectrum
+
+        if self._flux_floor is None:
+            self._flux_floor = flux
+
+        speech = energetic and flux >= self._flux_floor * self.flux_ratio
+        if not speech:
+            self._flux_floor += self.adapt_rate * (flux - self._flux_floor)
+
+        return speech
+
+    def reset(self):
+        super().reset()
+        self._prev_spectrum = None
+        self._flux_floor = None
+
+
+class WebRTCVAD(VoiceActivityDetector):
+    """WebRTC VAD（需要安装 webrtcvad），按 30ms 子帧投票"""
+
+    SUPPORTED_RATES = (8000, 16000, 32000, 48000)
+
+    def __init__(self, sample_rate: int, channels: int = 1, aggressiveness: int = 2, speech_ratio: float = 0.5):
+        super().__init__(sample_rate, channels)
+        if sample_rate not in self.SUPPORTED_RATES:
+            raise ValueError(f"WebRTC VAD 不支持采样率 {sample_rate}")
+
+        try:
+            import webrtcvad
+            self.vad = webrtcvad.Vad(aggressiveness)
+        except ImportError:
+            logger.error("未安装 webrtcvad，请运行: pip install webrtcvad")
+            raise
+
+        self.frame_samples = sample_rate * 30 // 1000
+        self.speech_ratio = speech_ratio
+
+    def is_speech(self, samples: np.ndarray) -> bool:
+        audio = samples
+        if self.channels > 1:
+            audio = samples.reshape(-1, self.channels).mean(axis=1).astype(np.int16)
+
+        votes = 0
+        frames = 0
+        for start in range(0, len(audio) - self.frame_samples + 1, self.frame_samples):
+            frame = audio[start:start + self.frame_samples].tobytes()
+            votes += self.vad.is_speech(frame, self.sample_rate)
+            frames += 1
+
+        return frames > 0 and votes / frames >= self.speech_ratio
+
+
+class SileroVAD(VoiceActivityDetector):
+    """Silero VAD 模型（需要安装 silero-vad，CPU 推理），按 512 样本窗口取最大语音概率"""
+
+    def __init__(self, sample_rate: int, channels: int = 1, threshold: float = 0.5):
+        super().__init__(sample_rate, channels)
+        if sample_rate != 16000:
+            raise ValueError("Silero VAD 需要 16kHz 采样率")
+
+        try:
+            import torch
+            from silero_vad import load_silero_vad
+            torch.set_num_threads(1)
+            self.torch = torch
+            self.model = load_silero_vad()
+        except ImportError:
+            logger.error("未安装 silero-vad，请运行: pip install silero-vad")
+            raise
+
+        self.threshold = threshold
+        self.window = 512
+
+    def is_speech(self, samples: np.ndarray) -> bool:
+        audio = to_mono_float(samples, self.channels).astype(np.float32)
+
+        best = 0.0
+        with self.torch.no_grad():
+            for start in range(0, len(audio) - self.window + 1, self.window):
+                window = self.torch.from_numpy(audio[start:start + self.window])
+                best = max(best, float(self.model(window, self.sample_rate).item()))
+        return best >= self.threshold
+
+    def reset(self):
+        self.model.reset_states()
+
+
+def create_vad(sample_rate: int, channels: int = 1) -> VoiceActivityDetector:
+    """根据配置创建 VAD，模型类引擎不可用时回退到能量检测"""
+    engine = Config.VAD_ENGINE.lower()
+
+    def energy_vad():
+        return EnergyVAD(sample_rate, channels, Config.SILENCE_THRESHOLD, Config.VAD_NOISE_RATIO)
+
+    try:
+        if engine == 'energy':
+            return energy_vad()
+        elif engine == 'spectral':
+            return SpectralFluxVAD(sample_rate, channels, Config.SILENCE_THRESHOLD, Config.VAD_NOISE_RATIO)
+        elif engine == 'webrtc':
+            return WebRTCVAD(sample_rate, channels, Config.VAD_WEBRTC_AGGRESSIVENESS)
+        elif engine == 'silero':
+            return SileroVAD(sample_rate, channels, Config.VAD_SPEECH_THRESHOLD)
+        else:
+            logger.warning(f"未知的 VAD 引擎：{engine}，使用能量检测")
+            return energy_vad()
+    except Exception as e:
+        logger.error(f"创建 VAD 引擎失败：{str(e)}")
+        logger.info("回退到能量检测")
+        return energy_vad()
+
+
+class VADSegmenter:
+    """
+    基于 VAD 的分段状态机
+
+    - 连续 min_speech 时长的语音块才算语音开始，减少噪声误触发
+    - 语音开始时带上 pre_roll 时长的前置音频，避免吞掉首字
+    - 静音超过 silence_duration 结束片段，片段只保留 hangover 时长的尾部静音
+    - 片段达到 max_segment 时强制切分
+
+    音频写入预分配的环形缓冲区，片段结束时只做一次切片复制
+    """
+
+    def __init__(self, vad: VoiceActivityDetector, chunk_duration: float, silence_duration: float,
+                 pre_roll: float = 0.3, hangover: float = 0.3, min_speech: float = 0.1,
+                 max_segment: float = 30.0):
+        self.vad = vad
+        self.chunk_duration = chunk_duration
+        self.silence_chunks = max(1, int(round(silence_duration / chunk_duration)))
+        self.min_speech_chunks = max(1, int(round(min_speech / chunk_duration)))
+
+        # 以交织后的 int16 样本数计量
+        self.samples_per_second = vad.sample_rate * vad.channels
+        self.pre_roll_samples = int(pre_roll * vad.sample_rate) * vad.channels
+        self.hangover_samples = int(hangover * vad.sample_rate) * vad.channels
+        self.max_segment_samples = int(max_segment * vad.sample_rate) * vad.channels
+
+        chunk_samples = int(chunk_duration * self.samples_per_second)
+        self.buffer = AudioRingBuffer(
+            self.pre_roll_samples + self.max_segment_samples + chunk_samples * (self.min_speech_chunks + 1)
+        )
+
+        self._in_speech = False
+        self._onset_count = 0
+        self._onset_start = 0
+        self._silent_count = 0
+        self._segment_start = 0
+        self._last_speech_end = 0
+
+    @property
+    def in_speech(self) -> bool:
+        return self._in_speech
+
+    def process(self, samples: np.ndarray) -> Tuple[Optional[str], np.ndarray]:
+        """
+        处理一块 int16 音频
+
+        Returns:
+            (事件, 音频)：
+            - (EVENT_SPEECH_START, 预录音频 + 当前块)
+            - (EVENT_SPEECH, 当前块)
+            - (EVENT_SPEECH_END, 完整片段，已裁掉多余的尾部静音)
+            - (None, 空数组) 非语音状态
+        """
+        speech = self.vad.is_speech(samples)
+        position = self.buffer.write(samples)
+        chunk_end = position + len(samples.reshape(-1))
+
+        if not self._in_speech:
+            if not speech:
+                self._onset_count = 0
+                return None, _EMPTY
+            if self._onset_count == 0:
+                self._onset_start = position
+            self._onset_count += 1
+            if self._onset_count < self.min_speech_chunks:
+                return None, _EMPTY
+
+            self._begin_segment(max(self.buffer.start, self._onset_start - self.pre_roll_samples), chunk_end)
+            return EVENT_SPEECH_START, self.buffer.read(self._segment_start, chunk_end)
+
+        if speech:
+            self._silent_count = 0
+            self._last_speech_end = chunk_end
+        else:
+            self._silent_count += 1
+            if self._silent_count >= self.silence_chunks:
+                return EVENT_SPEECH_END, self._finish(chunk_end)
+
+        if chunk_end - self._segment_start >= self.max_segment_samples:
+            if self._silent_count > 0:
+                # 已进入尾部静音，直接正常结束
+                return EVENT_SPEECH_END, self._finish(chunk_end)
+            # 仍在说话，强制切分，后续音频作为新片段继续
+            segment = self.buffer.read(self._segment_start, chunk_end)
+            self._begin_segment(chunk_end, chunk_end)
+            return EVENT_SPEECH_END, segment
+
+        return EVENT_SPEECH, samples
+
+    def flush(self) -> np.ndarray:
+        """录音结束时取出未完成的片段"""
+        if not self._in_speech:
+            return _EMPTY
+        return self._finish(self.buffer.end)
+
+    def speech_duration(self, segment: np.ndarray) -> float:
+        """片段时长（秒）"""
+        return len(segment) / float(self.samples_per_second)
+
+    def _begin_segment(self, start: int, last_speech_end: int):
+        self._in_speech = True
+        self._silent_count = 0
+        self._segment_start = start
+        self._last_speech_end = last_speech_end
+
+    def _finish(self, end: int) -> np.ndarray:
+        end = min(end, self._last_speech_end + self.hangover_samples)
+        segment = self.buffer.read(self._segment_start, end)
+        self._in_speech = False
+        self._onset_count = 0
+        self._silent_count = 0
+        return segment
+
@@ -1,9 +1,10 @@
-import whisper
 import openai
 import os
 import logging
 from typing import Optional
 from config import Config
+from asr_engines import load_whisper_engine, whisper_model_key
+from model_registry import model_registry
 
 logger = logging.getLogger(__name__)
 
@@ -19,14 +20,13 @@ class WhisperClient:
             openai.api_key = Config.OPENAI_API_KEY
             logger.info("使用 OpenAI Whisper API")
         else:
-            # 使用本地 Whisper 模型
-            try:
-                logger.info(f"加载本地 Whisper 模型：{Config.WHISPER_MODEL}")
-                self.model = whisper.load_model(Config.WHISPER_MODEL)
-                logger.info("本地 Whisper 模型加载成功")
-            except Exception as e:
-                logger.error(f"加载本地 Whisper 模型失败：{str(e)}")
-                raise
+            # 使用本地 Whisper 模型，由模型注册表懒加载，与 LocalWhisperProvider 共享同一实例
+            self.model_key = whisper_model_key('pytorch')
+    
+    @property
+    def model(self):
+        """首次访问时加载本地模型"""
+        return model_registry.get(*self.model_key, load_whisper_engine)
     
     def transcribe_audio(self, audio_file_path: str) -> Optional[str]:
         """
@@ -83,8 +83,7 @@ class WhisperClient:
             # 使用 Whisper 转录
             result = self.model.transcribe(
                 audio_file_path,
-                language="zh",  # 指定中文，可以根据需要调整
-                fp16=False  # 避免在某些设备上的兼容性问题
+                language="zh"  # 指定中文，可以根据需要调整
             )
             
             text = result.get('text', '').strip()
@@ -18,7 +18,7 @@ def test_backend_health():
         if response.status_code == 200:
             data = response.json()
             print("✅ 后端服务正常")
-            print(f"   - Gemini 可用: {data.get('gemini_available', False)}")
+            print(f"   - 大模型可用: {data.get('llm_available', False)}（{data.get('llm_provider')}）")
             return True
         else:
             print(f"❌ 后端服务异常，状态码: {response.status_code}")
@@ -31,6 +31,20 @@ def test_backend_health():
         print(f"❌ 后端测试失败: {str(e)}")
         return False
 
+def wait_for_answer(conversation_id, timeout=30):
+    """轮询对话状态，直到回答生成完成或超时"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = requests.get(f"http://localhost:5001/api/conversations/{conversation_id}", timeout=5)
+        if response.status_code == 200:
+            conversation = response.json()['conversation']
+            if conversation['answer_status'] in ('done', 'failed'):
+                print(f"   - 回答状态: {conversation['answer_status']}")
+                return conversation
+        time.sleep(1)
+    print("   - 等待回答超时")
+    return None
+
 def test_question_api():
     """测试问题接口"""
     try:
@@ -49,12 +63,15 @@ def test_question_api():
             timeout=30
         )
         
-        if response.status_code == 200:
+        if response.status_code in (200, 202):
             result = response.json()
             print("✅ 问题接口正常")
             print(f"   - 问题: {result['conversation']['question']}")
-            if result['conversation']['answer']:
-                print(f"   - 回答: {result['conversation']['answer'][:100]}...")
+            conversation = result['conversation']
+            if response.status_code == 202:
+                conversation = wait_for_answer(result['conversation_id'])
+            if conversation and conversation['answer']:
+                print(f"   - 回答: {conversation['answer'][:100]}...")
             return True
         else:
             print(f"❌ 问题接口异常，状态码: {response.status_code}")